@@ -0,0 +1,137 @@
+"""
+Benchmark config loading and spawn-time lookups on a synthetic configuration.
+
+A configuration with N courses x M semesters x K students is generated into a temporary
+directory. Each operation is measured for wall time and peak traced memory. The results are
+printed as JSON, so runs of different releases can be compared.
+
+Usage:
+    python benchmarks/bench_config.py [--courses N] [--semesters M] [--students K]
+        [--user-pool P] [--lookups L] [--output FILE]
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from generate_config import add_arguments, generate_config
+
+from e2x_exam_hub import ExamHub
+from e2x_exam_hub._version import __version__
+
+
+def measure(func: Callable[[], Any], calls: int = 1) -> Dict[str, Any]:
+    """
+    Run an operation once untraced for the wall time and once traced for the peak memory,
+    so the tracing overhead does not distort the timing.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(
+        result=result,
+        seconds=elapsed,
+        calls=calls,
+        seconds_per_call=elapsed / calls,
+        peak_bytes=peak,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    parser.add_argument(
+        "--lookups", type=int, default=1000, help="Number of lookups per operation"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking users")
+    parser.add_argument("--output", default="-", help="Output file, '-' for stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        generate_config(
+            root, args.courses, args.semesters, args.students, args.user_pool
+        )
+        results = dict()
+
+        load = measure(lambda: ExamHub(config_base_path=root))
+        hub = load.pop("result")
+        results["load_config"] = load
+
+        courses = hub.server_config.nbgrader.student_courses
+        users = sorted(hub.get_hub_users())
+        rng = random.Random(args.seed)
+        lookups = [rng.choice(users) for _ in range(args.lookups)]
+        members = [
+            (course, rng.choice(course.course_members))
+            for course in (rng.choice(courses) for _ in range(args.lookups))
+        ]
+
+        def get_user_courses():
+            for username in lookups:
+                hub.get_user_courses(username)
+
+        def get_volume_mounts():
+            for course, username in members:
+                hub.get_volume_mounts(course, username)
+
+        def get_volume_mounts_uncached():
+            for course, username in members:
+                hub.server_config.mounts.clear_cache()
+                hub.get_volume_mounts(course, username)
+
+        def get_commands():
+            for course, _ in members:
+                hub.get_server_commands() + hub.get_course_commands(course)
+
+        def get_spawn_profile():
+            for username in lookups:
+                hub.get_spawn_profile(username)
+
+        operations = dict(
+            get_hub_users=(hub.get_hub_users, 1),
+            get_user_courses=(get_user_courses, args.lookups),
+            get_volume_mounts=(get_volume_mounts, args.lookups),
+            get_volume_mounts_uncached=(get_volume_mounts_uncached, args.lookups),
+            get_commands=(get_commands, args.lookups),
+            get_spawn_profile=(get_spawn_profile, args.lookups),
+        )
+        for name, (func, calls) in operations.items():
+            result = measure(func, calls)
+            result.pop("result")
+            results[name] = result
+
+    report = dict(
+        version=__version__,
+        python=platform.python_version(),
+        parameters=dict(
+            courses=args.courses,
+            semesters=args.semesters,
+            students=args.students,
+            user_pool=args.user_pool,
+            rosters=len(courses),
+            roster_entries=sum(len(course.course_members) for course in courses),
+            distinct_users=len(users),
+        ),
+        results=results,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Measure the memory retained by a loaded ServerConfig of a synthetic configuration.
+
+The configuration is loaded with tracemalloc tracing, and the memory still allocated once
+it is loaded and garbage is collected is reported. This includes the course models with
+their rosters, the user index and all caches built on load. To compare two versions of the
+package, run the benchmark against each version. For example, point PYTHONPATH at a
+checkout of the other version, write its result with --output and pass that file to
+--compare. The results are printed as JSON.
+
+Usage:
+    python benchmarks/bench_memory.py [--courses N] [--semesters M] [--students K]
+        [--user-pool P] [--compare FILE] [--output FILE]
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import tracemalloc
+
+from generate_config import add_arguments, generate_config
+
+from e2x_exam_hub.schema import ServerConfig
+
+
+def measure_retained(config_file: str) -> int:
+    """
+    Load a config and get the number of bytes allocated by the load that are still held by
+    the loaded config.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        server_config = ServerConfig.from_yaml_file(config_file)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del server_config
+    return retained
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="A result of an earlier run, e.g. of another version, to compare with",
+    )
+    parser.add_argument("--output", default="-", help="Output file, '-' for stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        config_file = generate_config(
+            root, args.courses, args.semesters, args.students, args.user_pool
+        )
+        server_config = ServerConfig.from_yaml_file(config_file)
+        courses = server_config.nbgrader.student_courses
+        entries = sum(len(course.course_members) for course in courses)
+        users = len({username for c in courses for username in c.course_members})
+        del server_config, courses
+        retained = measure_retained(config_file)
+
+    parameters = dict(
+        courses=args.courses,
+        semesters=args.semesters,
+        students=args.students,
+        user_pool=args.user_pool,
+        roster_entries=entries,
+        distinct_users=users,
+    )
+    results = dict(bytes=retained, bytes_per_entry=retained / entries)
+    if args.compare:
+        with open(args.compare, "r") as file:
+            previous = json.load(file)
+        if previous["parameters"] != parameters:
+            print(f"{args.compare} was measured with other parameters", file=sys.stderr)
+            return 2
+        results["compared_bytes"] = previous["results"]["bytes"]
+        results["reduction"] = 1 - retained / previous["results"]["bytes"]
+
+    report = dict(
+        python=platform.python_version(),
+        parameters=parameters,
+        results=results,
+    )
+    output = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
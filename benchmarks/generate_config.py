@@ -0,0 +1,154 @@
+"""
+Generate a synthetic exam hub configuration shaped like the example in the config directory.
+
+The configuration has N courses with M semesters each and K students per roster. By default
+every roster has its own students. With --user-pool the students are drawn from a pool of that
+size, so the same usernames appear in several rosters as in multi-semester setups.
+
+Usage:
+    python benchmarks/generate_config.py OUTPUT_DIR [--courses N] [--semesters M]
+        [--students K] [--user-pool P]
+"""
+
+import argparse
+import os
+import sys
+from typing import Optional
+
+import yaml
+
+EXAM_COURSE_DIR = "nbgrader/student_exam_courses"
+
+
+def generate_config(
+    root: str,
+    courses: int,
+    semesters: int,
+    students: int,
+    user_pool: Optional[int] = None,
+) -> str:
+    """
+    Write a synthetic configuration to a directory.
+
+    Args:
+        root (str): The directory to write the configuration to.
+        courses (int): The number of courses.
+        semesters (int): The number of semesters per course.
+        students (int): The number of students per roster.
+        user_pool (Optional[int]): The number of distinct usernames. Defaults to None, which
+            gives every roster its own students.
+
+    Returns:
+        str: The path of the generated server config file.
+    """
+    active_student_courses = dict()
+    roster = 0
+    for course_index in range(courses):
+        course_name = f"Course-{course_index:04d}"
+        course_dir = os.path.join(root, EXAM_COURSE_DIR, course_name)
+        os.makedirs(course_dir, exist_ok=True)
+        semester_configs = []
+        for semester_index in range(semesters):
+            semester = (
+                f"{'SS' if semester_index % 2 else 'WS'}{20 + semester_index // 2}"
+            )
+            exam_period = "PZ1"
+            semester_configs.append(dict(semester=semester, exam_period=exam_period))
+            prefix = os.path.join(course_dir, f"{course_name}.{semester}.{exam_period}")
+            with open(f"{prefix}.yaml", "w") as file:
+                yaml.safe_dump(
+                    dict(
+                        exchange=dict(
+                            personalized_feedback=True,
+                            personalized_inbound=True,
+                            personalized_outbound=course_index % 2 == 0,
+                        ),
+                        commands=dict(
+                            course=[
+                                f'echo c.Course.name = \\"{course_name}\\" >> '
+                                "/etc/jupyter/nbgrader_config.py"
+                            ]
+                        ),
+                        resources=dict(
+                            cpu_guarantee=0.5,
+                            cpu_limit=2.0,
+                            mem_guarantee="1.0G",
+                            mem_limit="2.0G",
+                        ),
+                    ),
+                    file,
+                )
+            with open(f"{prefix}.csv", "w") as file:
+                file.write("Username,Name\n")
+                for student_index in range(students):
+                    user_id = roster * students + student_index
+                    if user_pool:
+                        user_id %= user_pool
+                    file.write(f"user{user_id:07d},Student {user_id}\n")
+            roster += 1
+        active_student_courses[course_name] = dict(semesters=semester_configs)
+
+    config = dict(
+        commands=dict(
+            clean_up=["rm -rf $HOME/.jupyter/nbconfig*"],
+            nbgrader=[
+                'echo c.Exchange.timezone = \\"Europe/Berlin\\" >> '
+                "/etc/jupyter/nbgrader_config.py"
+            ],
+        ),
+        mounts=dict(
+            exchange=dict(name="disk3", subPath="nbgrader/exchanges"),
+            share=dict(name="disk3", subPath="shares/exam"),
+            temp=dict(name="disk2", subPath="homes"),
+            home=dict(name="disk2", subPath="homes"),
+        ),
+        image=dict(
+            name="ghcr.io/digiklausur/docker-stacks/datascience-notebook-exam",
+            pullPolicy="IfNotPresent",
+            tag="16-07-2024",
+        ),
+        nbgrader=dict(
+            exchange_root="/srv/nbgrader/exchange",
+            exam_course_dir=EXAM_COURSE_DIR,
+            active_student_courses=active_student_courses,
+        ),
+        resources=dict(
+            cpu_guarantee=0.001, cpu_limit=2.0, mem_guarantee="1.0G", mem_limit="2.0G"
+        ),
+    )
+    config_file = os.path.join(root, "config-exam.yaml")
+    with open(config_file, "w") as file:
+        yaml.safe_dump(config, file, sort_keys=False)
+    return config_file
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--courses", type=int, default=20, help="Number of courses")
+    parser.add_argument(
+        "--semesters", type=int, default=3, help="Number of semesters per course"
+    )
+    parser.add_argument(
+        "--students", type=int, default=200, help="Number of students per roster"
+    )
+    parser.add_argument(
+        "--user-pool",
+        type=int,
+        default=None,
+        help="Number of distinct usernames shared by all rosters",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output_dir", help="Directory to write the configuration to")
+    add_arguments(parser)
+    args = parser.parse_args()
+    config_file = generate_config(
+        args.output_dir, args.courses, args.semesters, args.students, args.user_pool
+    )
+    print(config_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Measure the time it takes to import e2x_exam_hub in a fresh interpreter.
+
+Each measurement runs in its own subprocess so that nothing is cached between runs. The script
+also checks that no heavy module (e.g. pandas) is pulled in by the import.
+
+Usage:
+    python benchmarks/import_time.py [--repeat N] [--budget-ms MS]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "numpy"]
+
+STATEMENTS = {
+    "package": "import e2x_exam_hub",
+    "exam_hub": "from e2x_exam_hub import ExamHub",
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+import json
+print(json.dumps([elapsed, heavy]))
+"""
+
+
+def measure(statement: str) -> tuple:
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+        text=True,
+    )
+    # The result is the last line, in case the import itself prints anything
+    elapsed, heavy = json.loads(output.splitlines()[-1])
+    return elapsed, heavy
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Number of runs per statement")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=None,
+        help="Fail if the median import time of ExamHub exceeds this many milliseconds",
+    )
+    args = parser.parse_args()
+
+    results = dict()
+    failed = False
+    for name, statement in STATEMENTS.items():
+        timings = []
+        heavy = set()
+        for _ in range(args.repeat):
+            elapsed, loaded = measure(statement)
+            timings.append(elapsed * 1000)
+            heavy.update(loaded)
+        results[name] = dict(
+            statement=statement,
+            median_ms=round(statistics.median(timings), 2),
+            min_ms=round(min(timings), 2),
+            heavy_modules=sorted(heavy),
+        )
+        failed = failed or bool(heavy)
+
+    if args.budget_ms is not None and results["exam_hub"]["median_ms"] > args.budget_ms:
+        failed = True
+
+    print(json.dumps(results, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Compare building volume mounts with pydantic models against rendering precompiled templates.
+
+The mount cache is bypassed, so both variants do the full work of a cache miss. The script
+checks that both variants produce the same mounts for every course member.
+
+Usage:
+    python benchmarks/mount_templates.py [--config CONFIG_FILE] [--number N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+
+from e2x_exam_hub.schema import ServerConfig
+from e2x_exam_hub.schema.templates import render_mount_templates
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--config", default="config/config-exam.yaml", help="Path of the server config"
+    )
+    parser.add_argument("--number", type=int, default=20000, help="Calls per variant")
+    args = parser.parse_args()
+
+    server_config = ServerConfig.from_yaml_file(args.config)
+    mounts = server_config.mounts
+    courses = server_config.nbgrader.student_courses
+
+    for course in courses:
+        templates = mounts.get_templates(course)
+        for username in course.course_members:
+            expected = mounts._build_mounts(course, username)
+            if render_mount_templates(templates, username) != expected:
+                print(f"Mismatch for {username} in {course.course_id}", file=sys.stderr)
+                return 1
+
+    course = courses[0]
+    username = course.course_members[0]
+    templates = mounts.get_templates(course)
+    models = timeit.timeit(
+        lambda: mounts._build_mounts(course, username), number=args.number
+    )
+    rendered = timeit.timeit(
+        lambda: render_mount_templates(templates, username), number=args.number
+    )
+    results = dict(
+        calls=args.number,
+        pydantic_us_per_call=round(models / args.number * 1e6, 3),
+        template_us_per_call=round(rendered / args.number * 1e6, 3),
+        speedup=round(models / rendered, 1),
+    )
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,16 @@
-from .exam_hub import ExamHub
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .exam_hub import ExamHub
 
 __all__ = ["ExamHub"]
+
+
+def __getattr__(name: str):
+    # ExamHub pulls in traitlets, pydantic and yaml. Import it on first access so that
+    # importing the package itself stays cheap.
+    if name == "ExamHub":
+        from .exam_hub import ExamHub
+
+        return ExamHub
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import time
+from typing import Dict, Optional
+
+from . import metrics
+
+
+class AdmissionError(Exception):
+    """
+    Raised when a spawn is rejected because too many spawns are already waiting.
+    """
+
+
+def load_admission_schedule(file_path: str) -> Dict[str, float]:
+    """
+    Load the admission offset of each user from a plan written by 'e2x-exam-hub
+    capacity-plan'.
+
+    Args:
+        file_path (str): The path of the plan file.
+
+    Returns:
+        Dict[str, float]: The offset of each user in seconds after the exam start.
+    """
+    with open(file_path, "r") as file:
+        plan = json.load(file)
+    return {
+        username: wave["offset"]
+        for wave in plan["waves"]
+        for username in wave["usernames"]
+    }
+
+
+class AdmissionController:
+    """
+    Throttles spawns, so the cluster and the storage are not hit by all users at once when an
+    exam starts.
+
+    Spawns are admitted in the order they arrive at no more than rate per second, with bursts
+    of up to burst spawns. With a schedule, a user is not admitted before the offset of their
+    wave after the exam start. Users without an offset are only rate limited. With
+    max_concurrent, a spawn is also not admitted while that many admitted spawns are still
+    starting. Each admitted spawn holds a slot until release is called for it.
+
+    Args:
+        rate (float): The number of spawns admitted per second. 0 disables the rate limit.
+        burst (int): The number of spawns that can be admitted at once after a quiet period.
+        max_waiting (int): The number of spawns that can wait at the same time. Further
+            spawns are rejected with an AdmissionError. 0 means no limit.
+        schedule (Optional[Dict[str, float]]): The admission offset of each user in seconds
+            after the exam start.
+        exam_start (Optional[float]): The exam start as a Unix timestamp. The schedule is
+            ignored without it.
+        max_concurrent (int): The number of admitted spawns that can be starting at the same
+            time. 0 means no limit.
+    """
+
+    def __init__(
+        self,
+        rate: float = 0.0,
+        burst: int = 1,
+        max_waiting: int = 0,
+        schedule: Optional[Dict[str, float]] = None,
+        exam_start: Optional[float] = None,
+        max_concurrent: int = 0,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_waiting = max_waiting
+        self.schedule = schedule or dict()
+        self.exam_start = exam_start
+        self.max_concurrent = max_concurrent
+        self.admitted = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.starting = 0
+        self.total_wait = 0.0
+        # The earliest time the next spawn can be admitted without a burst (GCRA)
+        self._next_admission = 0.0
+        # Created on first use, so it belongs to the event loop of the hub
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _reserve(self) -> float:
+        now = time.monotonic()
+        if not self.rate:
+            return 0.0
+        interval = 1 / self.rate
+        admission = max(now, self._next_admission - (self.burst - 1) * interval)
+        self._next_admission = max(self._next_admission, admission) + interval
+        return admission - now
+
+    async def admit(self, username: str) -> float:
+        """
+        Wait until a spawn of a user can be admitted.
+
+        Args:
+            username (str): The user to spawn the server of.
+
+        Returns:
+            float: The time waited in seconds.
+
+        Raises:
+            AdmissionError: If too many spawns are already waiting.
+        """
+        if self.max_waiting and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            metrics.increment("spawn_admission_rejected_total")
+            raise AdmissionError(
+                f"Too many servers are starting, {self.waiting} are waiting. "
+                "Please try again in a moment"
+            )
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            offset = self.schedule.get(username)
+            if offset is not None and self.exam_start is not None:
+                await asyncio.sleep(max(self.exam_start + offset - time.time(), 0))
+            if self.max_concurrent:
+                if self._slots is None:
+                    self._slots = asyncio.Semaphore(self.max_concurrent)
+                await self._slots.acquire()
+                self.starting += 1
+            try:
+                delay = self._reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            except BaseException:
+                self.release()
+                raise
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        metrics.observe("spawn_admission_wait_seconds", waited)
+        return waited
+
+    def release(self) -> None:
+        """
+        Return the slot of an admitted spawn once the server started or failed to start.
+        Does nothing without max_concurrent.
+        """
+        if self._slots is not None and self.starting > 0:
+            self.starting -= 1
+            self._slots.release()
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """
+        The admitted, rejected, currently waiting and starting spawns and the average wait
+        in seconds.
+        """
+        return dict(
+            admitted=self.admitted,
+            rejected=self.rejected,
+            waiting=self.waiting,
+            starting=self.starting,
+            average_wait=self.total_wait / self.admitted if self.admitted else 0.0,
+        )
@@ -0,0 +1,453 @@
+import hashlib
+import json
+import os
+import tarfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .provision import is_inside
+from .schema import ServerConfig, StudentCourse
+from .schema.roster import is_safe_username
+from .schema.templates import USERNAME_PLACEHOLDER
+
+MANIFEST_FILE = "manifest.jsonl"
+CHUNK_SIZE = 1024 * 1024
+
+# A directory to archive and its name in the archive
+Source = Tuple[str, str]
+
+
+class _HashingWriter:
+    """
+    Writes to a file and computes the SHA-256 of everything written, so an archive is
+    checksummed while it is streamed instead of being read again.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+
+def file_sha256(file_path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ArchiveReport:
+    """
+    Progress and result of archiving the student directories.
+
+    Attributes:
+        created (int): Archives written in this run.
+        skipped (int): Archives already in the manifest of an earlier run.
+        missing (List[str]): Students without any directory to archive, as
+            course_name.semester_id.exam_period/username.
+        errors (Dict[str, str]): The error for each student that could not be archived.
+        source_bytes (int): The size of the archived files in bytes.
+        archive_bytes (int): The size of the written archives in bytes.
+        duration (float): The time spent so far in seconds.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.skipped = 0
+        self.missing: List[str] = []
+        self.errors: Dict[str, str] = dict()
+        self.source_bytes = 0
+        self.archive_bytes = 0
+        self.duration = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.created + self.skipped + len(self.missing) + len(self.errors)
+
+    @property
+    def throughput(self) -> float:
+        """
+        The number of archived source bytes per second.
+        """
+        return self.source_bytes / self.duration if self.duration else 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(
+            created=self.created,
+            skipped=self.skipped,
+            missing=sorted(self.missing),
+            errors=dict(self.errors),
+            source_bytes=self.source_bytes,
+            archive_bytes=self.archive_bytes,
+            duration=self.duration,
+            throughput=self.throughput,
+        )
+
+
+class Archiver:
+    """
+    Archives the home directory and the inbound submissions of every course member into one
+    compressed tar archive per student, e.g. to retain them after an exam.
+
+    The directories are resolved like the mounts of the single-user servers, relative to a
+    local directory per volume. The archives are streamed to disk by a pool of threads, so
+    memory does not grow with the size of the directories or the number of students. Each
+    archive is first written to a temporary file and then moved into place, and a line with
+    its SHA-256 is appended to manifest.jsonl in the output directory. A run that was
+    interrupted can be repeated and skips every student already in the manifest whose
+    archive still has the recorded size.
+
+    Args:
+        server_config (ServerConfig): The config with the courses to archive.
+        volume_roots (Dict[str, str]): The local directory of each volume by volume name.
+            The home volume, and the exchange volume if inbound is included, are required.
+        output_dir (str): The directory the archives and the manifest are written to.
+        course_keys (Optional[Iterable[Tuple[str, str, str]]]): The courses to archive.
+            Defaults to None, which archives all configured courses.
+        include_inbound (bool): Whether to archive the inbound submissions too.
+        compresslevel (int): The gzip compression level from 1 to 9.
+        max_workers (int): The number of threads writing archives.
+        verify (bool): Whether to check the checksum of existing archives before skipping
+            them, instead of only their size.
+    """
+
+    def __init__(
+        self,
+        server_config: ServerConfig,
+        volume_roots: Dict[str, str],
+        output_dir: str,
+        course_keys: Optional[Iterable[Tuple[str, str, str]]] = None,
+        include_inbound: bool = True,
+        compresslevel: int = 6,
+        max_workers: int = 4,
+        verify: bool = False,
+    ):
+        mounts = server_config.mounts
+        required = [mounts.home.name]
+        if include_inbound:
+            required.append(mounts.exchange.name)
+        missing = [name for name in required if name not in volume_roots]
+        if missing:
+            raise ValueError(
+                f"The local directory of the volume(s) {', '.join(missing)} is required"
+            )
+        self.server_config = server_config
+        self.volume_roots = volume_roots
+        self.output_dir = output_dir
+        self.course_keys = set(course_keys) if course_keys is not None else None
+        self.include_inbound = include_inbound
+        self.compresslevel = compresslevel
+        self.max_workers = max_workers
+        self.verify = verify
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict[str, Dict[str, object]]:
+        """
+        Load the entries of earlier runs. A line that was cut off by an interruption is
+        ignored.
+
+        Returns:
+            Dict[str, Dict[str, object]]: The latest entry of each archive by its path
+            relative to the output directory.
+        """
+        entries = dict()
+        if not os.path.exists(self.manifest_path):
+            return entries
+        with open(self.manifest_path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[entry["archive"]] = entry
+        return entries
+
+    def get_archive_name(self, course: StudentCourse, username: str) -> str:
+        """
+        Get the path of the archive of a student relative to the output directory.
+
+        Args:
+            course (StudentCourse): The course.
+            username (str): The username of the student.
+
+        Returns:
+            str: The path of the archive.
+
+        Raises:
+            ValueError: If the archive would be written outside of the output directory,
+                e.g. because of a username like "../../etc".
+        """
+        archive = os.path.join(".".join(course.course_key), f"{username}.tar.gz")
+        if not is_inside(self.output_dir, os.path.join(self.output_dir, archive)):
+            raise ValueError(f"Archive of {username} is outside of {self.output_dir}")
+        return archive
+
+    def get_course_trees(self, course: StudentCourse) -> Dict[str, str]:
+        """
+        Get the local directories of a course that the sources of its students are in.
+
+        Args:
+            course (StudentCourse): The course.
+
+        Returns:
+            Dict[str, str]: The home directories of the course as "home", and the inbound
+            directory as "inbound" if inbound is included.
+        """
+        mounts = self.server_config.mounts
+        # The directory of a student is the first component that contains the username
+        home = mounts.get_home_mount(course, USERNAME_PLACEHOLDER)
+        trees = dict(
+            home=os.path.join(
+                self.volume_roots[home.name],
+                os.path.dirname(home.subPath.split(USERNAME_PLACEHOLDER)[0]),
+            )
+        )
+        if self.include_inbound:
+            trees["inbound"] = os.path.join(
+                self.volume_roots[mounts.exchange.name],
+                course.exchange.get_subPath(mounts.exchange, course, "", "inbound"),
+            )
+        return trees
+
+    def get_sources(self, course: StudentCourse, username: str) -> List[Source]:
+        """
+        Get the local directories of a student that exist and their names in the archive.
+
+        Args:
+            course (StudentCourse): The course.
+            username (str): The username of the student.
+
+        Returns:
+            List[Source]: The home directory as "home" and the inbound directory as
+            "inbound". With a shared inbound, each submission of the student is added as
+            "inbound/<submission>".
+
+        Raises:
+            ValueError: If the username is not a valid directory name, or a directory is
+                outside of the directories of the course on its volume.
+        """
+        if not is_safe_username(username):
+            raise ValueError(f"Username {username!r} is not a valid directory name")
+        mounts = self.server_config.mounts
+        home = mounts.get_home_mount(course, username)
+        sources = [
+            (
+                os.path.join(self.volume_roots[home.name], home.subPath),
+                "home",
+            )
+        ]
+        if self.include_inbound:
+            exchange = course.exchange
+            root = self.volume_roots[mounts.exchange.name]
+            if exchange.personalized_inbound:
+                inbound = exchange.get_subPath(
+                    mounts.exchange, course, username, "inbound"
+                )
+                sources.append((os.path.join(root, inbound), "inbound"))
+            else:
+                # nbgrader names shared submissions username+assignment+timestamp
+                inbound = os.path.join(
+                    root, exchange.get_subPath(mounts.exchange, course, "", "inbound")
+                )
+                if os.path.isdir(inbound):
+                    with os.scandir(inbound) as entries:
+                        sources.extend(
+                            (entry.path, os.path.join("inbound", entry.name))
+                            for entry in entries
+                            if entry.name.startswith(f"{username}+")
+                        )
+        trees = self.get_course_trees(course)
+        for path, name in sources:
+            tree = trees[name.split("/")[0]]
+            if not is_inside(tree, path):
+                raise ValueError(f"Source {name} of {username} is outside of {tree}")
+        return [(path, name) for path, name in sources if os.path.exists(path)]
+
+    def iter_students(self) -> Iterator[Tuple[StudentCourse, str]]:
+        """
+        Iterate over the members of the selected courses, one course at a time.
+
+        Yields:
+            Tuple[StudentCourse, str]: The course and the username of a student.
+        """
+        for view in self.server_config.nbgrader.course_views:
+            if self.course_keys is not None and view.course_key not in self.course_keys:
+                continue
+            course = view.course
+            for username in sorted(view.members):
+                yield course, username
+
+    def _is_archived(self, entry: Optional[Dict[str, object]]) -> bool:
+        if entry is None:
+            return False
+        path = os.path.join(self.output_dir, entry["archive"])
+        try:
+            if os.path.getsize(path) != entry["size"]:
+                return False
+        except OSError:
+            return False
+        return not self.verify or file_sha256(path) == entry["sha256"]
+
+    def archive_student(
+        self, course: StudentCourse, username: str
+    ) -> Optional[Dict[str, object]]:
+        """
+        Write the archive of a student.
+
+        Args:
+            course (StudentCourse): The course.
+            username (str): The username of the student.
+
+        Returns:
+            Optional[Dict[str, object]]: The manifest entry of the archive, None if the
+            student has no directory to archive.
+        """
+        sources = self.get_sources(course, username)
+        if not sources:
+            return None
+        archive = self.get_archive_name(course, username)
+        path = os.path.join(self.output_dir, archive)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        files = 0
+        source_bytes = 0
+
+        def count(member: tarfile.TarInfo) -> tarfile.TarInfo:
+            nonlocal files, source_bytes
+            if member.isfile():
+                files += 1
+                source_bytes += member.size
+            return member
+
+        partial = f"{path}.partial"
+        try:
+            with open(partial, "wb") as file:
+                writer = _HashingWriter(file)
+                with tarfile.open(
+                    fileobj=writer, mode="w:gz", compresslevel=self.compresslevel
+                ) as tar:
+                    for source, name in sources:
+                        tar.add(source, arcname=name, filter=count)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(partial, path)
+        except BaseException:
+            # Do not leave an incomplete archive behind, e.g. when the disk is full
+            try:
+                os.unlink(partial)
+            except FileNotFoundError:
+                pass
+            raise
+        return dict(
+            course=".".join(course.course_key),
+            username=username,
+            archive=archive,
+            sha256=writer.sha256.hexdigest(),
+            size=writer.size,
+            files=files,
+            source_bytes=source_bytes,
+            sources=[name for _, name in sources],
+            created=time.time(),
+        )
+
+    def _record(
+        self, report: ArchiveReport, manifest, student: str, future: Future
+    ) -> None:
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                report.errors[student] = f"{type(error).__name__}: {error}"
+                return
+            entry = future.result()
+            if entry is None:
+                report.missing.append(student)
+                return
+            manifest.write(json.dumps(entry) + "\n")
+            manifest.flush()
+            report.created += 1
+            report.source_bytes += entry["source_bytes"]
+            report.archive_bytes += entry["size"]
+
+    def run(
+        self,
+        progress: Optional[Callable[[ArchiveReport], None]] = None,
+        progress_interval: int = 100,
+    ) -> ArchiveReport:
+        """
+        Archive all students that are not archived yet.
+
+        Only a bounded number of students is queued for the threads at a time. When every
+        student was archived without errors, the SHA-256 of the manifest is written next to
+        it.
+
+        Args:
+            progress (Optional[Callable[[ArchiveReport], None]]): Called with the report
+                every progress_interval processed students.
+            progress_interval (int): The number of students between progress calls.
+
+        Returns:
+            ArchiveReport: The final report.
+        """
+        report = ArchiveReport()
+        start = time.perf_counter()
+        os.makedirs(self.output_dir, exist_ok=True)
+        archived = self.load_manifest()
+        pending: Dict[Future, str] = dict()
+        next_progress = progress_interval
+
+        with open(self.manifest_path, "a+") as manifest:
+            if manifest.tell() > 0:
+                manifest.seek(manifest.tell() - 1)
+                if manifest.read(1) != "\n":
+                    # Terminate a line that was cut off by an interruption
+                    manifest.write("\n")
+
+            def collect(futures):
+                nonlocal next_progress
+                for future in futures:
+                    self._record(report, manifest, pending.pop(future), future)
+                report.duration = time.perf_counter() - start
+                if progress is not None and report.processed >= next_progress:
+                    next_progress = report.processed + progress_interval
+                    progress(report)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for course, username in self.iter_students():
+                    student = f"{'.'.join(course.course_key)}/{username}"
+                    try:
+                        archive = self.get_archive_name(course, username)
+                    except ValueError as error:
+                        with self._lock:
+                            report.errors[student] = f"ValueError: {error}"
+                        continue
+                    if self._is_archived(archived.get(archive)):
+                        report.skipped += 1
+                        continue
+                    future = executor.submit(self.archive_student, course, username)
+                    pending[future] = student
+                    if len(pending) >= self.max_workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                collect(list(pending))
+            manifest.flush()
+            os.fsync(manifest.fileno())
+
+        if not report.errors:
+            with open(f"{self.manifest_path}.sha256", "w") as file:
+                file.write(f"{file_sha256(self.manifest_path)}  {MANIFEST_FILE}\n")
+        report.duration = time.perf_counter() - start
+        return report
@@ -0,0 +1,237 @@
+from typing import Dict, List, NamedTuple, Optional, Union
+
+from .schema import ServerConfig
+from .schema.utils import parse_cpu, parse_memory
+
+
+class CourseDemand(NamedTuple):
+    """
+    The resources guaranteed to the members of a course.
+
+    Attributes:
+        course (str): The course as course_name.semester_id.exam_period.
+        exam_period (str): The exam period of the course.
+        members (int): The number of course members.
+        cpu_guarantee (float): The CPU guarantee of one member in cores.
+        mem_guarantee (int): The memory guarantee of one member in bytes.
+        total_cpu (float): The CPU guarantee of all members in cores.
+        total_mem (int): The memory guarantee of all members in bytes.
+    """
+
+    course: str
+    exam_period: str
+    members: int
+    cpu_guarantee: float
+    mem_guarantee: int
+    total_cpu: float
+    total_mem: int
+
+
+class PeriodDemand(NamedTuple):
+    """
+    The resources guaranteed to all users of an exam period if they start at once.
+
+    Users in several courses of the period are counted once, with their first course.
+
+    Attributes:
+        exam_period (str): The exam period.
+        users (int): The number of distinct users.
+        total_cpu (float): The CPU guarantee of all users in cores.
+        total_mem (int): The memory guarantee of all users in bytes.
+        cpu_utilization (float): The share of the CPU capacity that is guaranteed.
+        mem_utilization (float): The share of the memory capacity that is guaranteed.
+    """
+
+    exam_period: str
+    users: int
+    total_cpu: float
+    total_mem: int
+    cpu_utilization: float
+    mem_utilization: float
+
+    @property
+    def fits(self) -> bool:
+        return self.cpu_utilization <= 1 and self.mem_utilization <= 1
+
+
+class AdmissionWave(NamedTuple):
+    """
+    A group of users of one course that is admitted together.
+
+    Attributes:
+        index (int): The position of the wave in the schedule.
+        offset (float): When the wave is admitted, in seconds after the exam start.
+        course (str): The course of the users.
+        usernames (List[str]): The users of the wave.
+        total_cpu (float): The CPU guarantee of this and all earlier waves in cores.
+        total_mem (int): The memory guarantee of this and all earlier waves in bytes.
+        fits (bool): Whether this and all earlier waves fit into the capacity.
+    """
+
+    index: int
+    offset: float
+    course: str
+    usernames: List[str]
+    total_cpu: float
+    total_mem: int
+    fits: bool
+
+
+class CapacityPlan:
+    """
+    The guaranteed resources of the courses compared with the capacity of the cluster, and a
+    staggered admission schedule.
+
+    Attributes:
+        cpu_capacity (float): The allocatable CPU of all nodes in cores.
+        mem_capacity (int): The allocatable memory of all nodes in bytes.
+        spawn_rate (float): The number of users admitted per second.
+        courses (List[CourseDemand]): The demand of each course.
+        periods (List[PeriodDemand]): The demand of each exam period.
+        waves (List[AdmissionWave]): The admission schedule.
+    """
+
+    def __init__(self, cpu_capacity: float, mem_capacity: int, spawn_rate: float):
+        self.cpu_capacity = cpu_capacity
+        self.mem_capacity = mem_capacity
+        self.spawn_rate = spawn_rate
+        self.courses: List[CourseDemand] = []
+        self.periods: List[PeriodDemand] = []
+        self.waves: List[AdmissionWave] = []
+
+    @property
+    def duration(self) -> float:
+        """
+        The time until the last wave is admitted, in seconds.
+        """
+        return self.waves[-1].offset if self.waves else 0.0
+
+    @property
+    def offsets(self) -> Dict[str, float]:
+        """
+        The admission offset of each scheduled user in seconds after the exam start.
+        """
+        return {
+            username: wave.offset for wave in self.waves for username in wave.usernames
+        }
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(
+            cpu_capacity=self.cpu_capacity,
+            mem_capacity=self.mem_capacity,
+            spawn_rate=self.spawn_rate,
+            duration=self.duration,
+            courses=[course._asdict() for course in self.courses],
+            periods=[
+                dict(period._asdict(), fits=period.fits) for period in self.periods
+            ],
+            waves=[wave._asdict() for wave in self.waves],
+        )
+
+
+def plan_capacity(
+    server_config: ServerConfig,
+    node_cpu: Union[str, float],
+    node_mem: Union[str, float],
+    nodes: int = 1,
+    exam_period: Optional[str] = None,
+    wave_size: int = 50,
+    spawn_rate: float = 1.0,
+) -> CapacityPlan:
+    """
+    Add up the resource guarantees of all course members and schedule their admission.
+
+    The schedule admits the users course by course in waves of at most wave_size users. The
+    waves are spaced so that no more than spawn_rate users are admitted per second. Every user
+    is scheduled once, with their first course.
+
+    Args:
+        server_config (ServerConfig): The config with the courses and rosters.
+        node_cpu (Union[str, float]): The allocatable CPU of one node, e.g. 16 or "15500m".
+        node_mem (Union[str, float]): The allocatable memory of one node, e.g. "64G".
+        nodes (int): The number of nodes for the single-user servers.
+        exam_period (Optional[str]): Only schedule the courses of this exam period. Defaults
+            to None, which schedules all courses.
+        wave_size (int): The maximum number of users in a wave.
+        spawn_rate (float): The number of users admitted per second.
+
+    Returns:
+        CapacityPlan: The demand of the courses and exam periods and the schedule.
+    """
+    if wave_size < 1 or spawn_rate <= 0:
+        raise ValueError("wave_size and spawn_rate must be positive")
+    plan = CapacityPlan(
+        cpu_capacity=parse_cpu(node_cpu) * nodes,
+        mem_capacity=parse_memory(node_mem) * nodes,
+        spawn_rate=spawn_rate,
+    )
+    period_users: Dict[str, Dict[str, CourseDemand]] = dict()
+    rosters: List[List[str]] = []
+    # Iterate over the views, so lazily loaded configs are planned without keeping every
+    # course model loaded at the same time
+    for view in server_config.nbgrader.course_views:
+        course = view.course
+        rosters.append(course.course_members)
+        resources = server_config.get_course_resources(course)
+        cpu = parse_cpu(resources.cpu_guarantee)
+        mem = parse_memory(resources.mem_guarantee)
+        members = len(course.course_members)
+        demand = CourseDemand(
+            course=".".join(course.course_key),
+            exam_period=course.exam_period,
+            members=members,
+            cpu_guarantee=cpu,
+            mem_guarantee=mem,
+            total_cpu=cpu * members,
+            total_mem=mem * members,
+        )
+        plan.courses.append(demand)
+        users = period_users.setdefault(course.exam_period, dict())
+        for username in course.course_members:
+            users.setdefault(username, demand)
+
+    for period, users in period_users.items():
+        total_cpu = sum(demand.cpu_guarantee for demand in users.values())
+        total_mem = sum(demand.mem_guarantee for demand in users.values())
+        plan.periods.append(
+            PeriodDemand(
+                exam_period=period,
+                users=len(users),
+                total_cpu=total_cpu,
+                total_mem=total_mem,
+                cpu_utilization=total_cpu / plan.cpu_capacity
+                if plan.cpu_capacity
+                else float("inf"),
+                mem_utilization=total_mem / plan.mem_capacity
+                if plan.mem_capacity
+                else float("inf"),
+            )
+        )
+
+    scheduled = set()
+    admitted = 0
+    total_cpu = 0.0
+    total_mem = 0
+    for roster, demand in zip(rosters, plan.courses):
+        if exam_period is not None and demand.exam_period != exam_period:
+            continue
+        usernames = [username for username in roster if username not in scheduled]
+        scheduled.update(usernames)
+        for start in range(0, len(usernames), wave_size):
+            wave = usernames[start : start + wave_size]
+            total_cpu += demand.cpu_guarantee * len(wave)
+            total_mem += demand.mem_guarantee * len(wave)
+            plan.waves.append(
+                AdmissionWave(
+                    index=len(plan.waves),
+                    offset=admitted / spawn_rate,
+                    course=demand.course,
+                    usernames=wave,
+                    total_cpu=total_cpu,
+                    total_mem=total_mem,
+                    fits=total_cpu <= plan.cpu_capacity
+                    and total_mem <= plan.mem_capacity,
+                )
+            )
+            admitted += len(wave)
+    return plan
@@ -0,0 +1,242 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+from pydantic import ValidationError
+
+from .schema import NbGrader, ServerConfig, StudentCourse
+from .schema.base import Image, Resources
+from .schema.mounts import Mounts
+from .schema.nbgrader import CourseKey
+
+SECTIONS = dict(image=Image, resources=Resources, mounts=Mounts)
+
+
+class CourseProfile(NamedTuple):
+    """
+    How long loading a student course took and how large its roster is.
+
+    Attributes:
+        course (str): The course as course_name.semester_id.exam_period.
+        config_file (str): The path of the course config file.
+        roster_file (str): The path of the roster file.
+        timings (Dict[str, float]): The duration of the yaml, roster and validation stages.
+        members (int): The number of course members.
+    """
+
+    course: str
+    config_file: str
+    roster_file: str
+    timings: Dict[str, float]
+    members: int
+
+    @property
+    def duration(self) -> float:
+        return sum(self.timings.values())
+
+
+class CheckReport:
+    """
+    The result of checking a server config and all of its course files.
+
+    Attributes:
+        config_file (str): The path of the server config file.
+        errors (List[str]): Every problem that prevents the config from loading.
+        warnings (List[str]): Problems that do not prevent loading, e.g. malformed roster
+            rows.
+        courses (List[CourseProfile]): The profile of each course. Courses that could not be
+            loaded have no members.
+        timings (Dict[str, float]): The duration of each stage of the check in seconds.
+    """
+
+    def __init__(self, config_file: str):
+        self.config_file = config_file
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+        self.courses: List[CourseProfile] = []
+        self.timings: Dict[str, float] = dict()
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def add_error(self, location: str, error: Exception) -> None:
+        """
+        Add an error. Validation errors are split into one entry per invalid field.
+
+        Args:
+            location (str): Where the error occurred, e.g. the section or course.
+            error (Exception): The error.
+        """
+        if isinstance(error, ValidationError):
+            for detail in error.errors():
+                field = ".".join(str(part) for part in detail["loc"])
+                self.errors.append(
+                    f"{location}: {field}: {detail['msg']}"
+                    if field
+                    else f"{location}: {detail['msg']}"
+                )
+        else:
+            self.errors.append(f"{location}: {type(error).__name__}: {error}")
+
+    def slowest_courses(self, count: int = 10) -> List[CourseProfile]:
+        return sorted(self.courses, key=lambda course: course.duration, reverse=True)[
+            :count
+        ]
+
+    def largest_rosters(self, count: int = 10) -> List[CourseProfile]:
+        return sorted(self.courses, key=lambda course: course.members, reverse=True)[
+            :count
+        ]
+
+    def stage_totals(self) -> Dict[str, float]:
+        """
+        The summed duration of each stage over all courses.
+
+        Returns:
+            Dict[str, float]: The total yaml, roster and validation time in seconds.
+        """
+        totals = dict(yaml=0.0, roster=0.0, validation=0.0)
+        for course in self.courses:
+            for stage, duration in course.timings.items():
+                totals[stage] = totals.get(stage, 0.0) + duration
+        return totals
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(
+            config_file=self.config_file,
+            ok=self.ok,
+            errors=list(self.errors),
+            warnings=list(self.warnings),
+            timings=dict(self.timings),
+            stage_totals=self.stage_totals(),
+            courses=[course._asdict() for course in self.courses],
+        )
+
+
+def _load_course(
+    base_path: str, key: CourseKey
+) -> Tuple[CourseProfile, Optional[StudentCourse], Optional[Exception]]:
+    config_file, roster_file = StudentCourse.get_course_files(base_path, *key)
+    timings: Dict[str, float] = dict()
+    try:
+        course = StudentCourse.from_yaml_file(base_path, *key, timings=timings)
+    except Exception as error:
+        return (
+            CourseProfile(".".join(key), config_file, roster_file, timings, 0),
+            None,
+            error,
+        )
+    profile = CourseProfile(
+        ".".join(key), config_file, roster_file, timings, len(course.course_members)
+    )
+    return profile, course, None
+
+
+def _check_sections(report: CheckReport, yaml_config: dict) -> None:
+    for name, model in SECTIONS.items():
+        if name not in yaml_config:
+            report.errors.append(f"{name}: section is missing")
+            continue
+        try:
+            model.model_validate(yaml_config[name])
+        except ValidationError as error:
+            report.add_error(name, error)
+
+
+def check_config(file_path: str, max_workers: int = 1) -> CheckReport:
+    """
+    Check a server config and all of its course files.
+
+    Unlike loading the config, the check does not stop at the first problem. Every section of
+    the server config and every course is validated on its own and all errors are collected.
+    If all of them are valid, the config is loaded with ServerConfig.from_yaml_file, reusing
+    the checked courses.
+
+    Args:
+        file_path (str): The path of the server config file.
+        max_workers (int): The number of threads used to load the course files.
+
+    Returns:
+        CheckReport: The errors, warnings and timings of the check.
+    """
+    report = CheckReport(file_path)
+    start = stage_start = time.perf_counter()
+
+    try:
+        with open(file_path, "r") as file:
+            yaml_config = yaml.safe_load(file)
+        if not isinstance(yaml_config, dict):
+            raise ValueError("the config is not a mapping")
+    except (OSError, yaml.YAMLError, ValueError) as error:
+        report.add_error(file_path, error)
+        return report
+    now = time.perf_counter()
+    report.timings["server_yaml"] = now - stage_start
+    stage_start = now
+
+    _check_sections(report, yaml_config)
+    nbgrader_dict = yaml_config.get("nbgrader")
+    course_keys: List[CourseKey] = []
+    base_path = None
+    if not isinstance(nbgrader_dict, dict) or "exam_course_dir" not in nbgrader_dict:
+        report.errors.append("nbgrader: exam_course_dir is missing")
+    else:
+        base_path = os.path.join(
+            os.path.dirname(file_path), nbgrader_dict["exam_course_dir"]
+        )
+        try:
+            course_keys = NbGrader.get_course_keys(nbgrader_dict)
+            windows = NbGrader.get_course_windows(nbgrader_dict)
+        except ValidationError as error:
+            report.add_error("nbgrader.active_student_courses", error)
+        else:
+            for key, (_, end) in windows.items():
+                if end is not None and end <= time.time():
+                    report.warnings.append(
+                        f"{'.'.join(key)}: the course ended at "
+                        f"{datetime.fromtimestamp(end).isoformat()} and is inactive"
+                    )
+    now = time.perf_counter()
+    report.timings["server_validation"] = now - stage_start
+    stage_start = now
+
+    courses: Dict[CourseKey, StudentCourse] = dict()
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+        results = executor.map(lambda key: _load_course(base_path, key), course_keys)
+        for key, (profile, course, error) in zip(course_keys, results):
+            report.courses.append(profile)
+            if error is not None:
+                report.add_error(profile.course, error)
+                continue
+            courses[key] = course
+            roster_report = course.roster_report
+            if roster_report.missing:
+                report.warnings.append(
+                    f"{profile.course}: roster file {roster_report.file} does not exist"
+                )
+            for roster_error in roster_report.errors:
+                report.warnings.append(
+                    f"{profile.course}: {roster_report.file}: {roster_error}"
+                )
+            if roster_report.malformed > len(roster_report.errors):
+                report.warnings.append(
+                    f"{profile.course}: {roster_report.file}: "
+                    f"{roster_report.malformed - len(roster_report.errors)} more "
+                    "malformed row(s)"
+                )
+    now = time.perf_counter()
+    report.timings["courses"] = now - stage_start
+    stage_start = now
+
+    if report.ok:
+        try:
+            ServerConfig.from_yaml_file(file_path, loaded_courses=courses)
+        except Exception as error:
+            report.add_error(file_path, error)
+        report.timings["config"] = time.perf_counter() - stage_start
+    report.timings["total"] = time.perf_counter() - start
+    return report
@@ -0,0 +1,627 @@
+import argparse
+import sys
+from typing import TYPE_CHECKING, Dict, List, Optional, TextIO, Tuple
+
+if TYPE_CHECKING:
+    from .schema import ServerConfig
+
+DEFAULT_CONFIG_FILE = "/srv/jupyterhub/config/config-exam.yaml"
+
+
+def export_mounts(args: argparse.Namespace) -> int:
+    from .export import write_mount_plans
+    from .schema import ServerConfig
+
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    if args.output == "-":
+        count = write_mount_plans(server_config, sys.stdout)
+    else:
+        with open(args.output, "w") as file:
+            count = write_mount_plans(server_config, file)
+    print(f"Exported the mounts of {count} course members", file=sys.stderr)
+    return 0
+
+
+def prepull_manifest(args: argparse.Namespace) -> int:
+    import yaml
+
+    from .export import build_prepuller_manifest
+    from .schema import ServerConfig
+
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    manifest = build_prepuller_manifest(server_config)
+    if args.output == "-":
+        yaml.safe_dump(manifest, sys.stdout, sort_keys=False)
+    else:
+        with open(args.output, "w") as file:
+            yaml.safe_dump(manifest, file, sort_keys=False)
+    return 0
+
+
+def provision(args: argparse.Namespace) -> int:
+    import json
+
+    from .provision import Provisioner
+    from .schema import ServerConfig
+
+    volume_roots = parse_volume_roots(args.volume)
+    if volume_roots is None:
+        return 2
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    provisioner = Provisioner(
+        server_config,
+        volume_roots,
+        uid=args.uid,
+        gid=args.gid,
+        mode=int(args.mode, 8) if args.mode else None,
+        include_read_only=not args.writable_only,
+        max_workers=args.workers,
+        dry_run=args.dry_run,
+    )
+
+    def progress(report):
+        print(
+            f"{report.processed} directories, {report.created} "
+            f"{'to create' if report.dry_run else 'created'}, "
+            f"{report.throughput:.0f}/s",
+            file=sys.stderr,
+        )
+
+    report = provisioner.run(progress=progress)
+    output = json.dumps(report.as_dict(), indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 1 if report.errors else 0
+
+
+def check(args: argparse.Namespace) -> int:
+    from .check import check_config
+
+    report = check_config(args.config_file, max_workers=args.workers)
+    if args.output == "-":
+        print_check_report(report, args, sys.stdout)
+    else:
+        with open(args.output, "w") as file:
+            print_check_report(report, args, file)
+    if not report.ok or (args.strict and report.warnings):
+        return 1
+    return 0
+
+
+def print_check_report(report, args: argparse.Namespace, file: TextIO) -> None:
+    import json
+
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2), file=file)
+        return
+    for error in report.errors:
+        print(f"ERROR {error}", file=file)
+    for warning in report.warnings:
+        print(f"WARNING {warning}", file=file)
+    print(
+        f"Checked {args.config_file} with {len(report.courses)} course(s): "
+        f"{len(report.errors)} error(s), {len(report.warnings)} warning(s)",
+        file=file,
+    )
+    if args.profile:
+        print_profile(report, args.top, file)
+
+
+def print_profile(report, top: int, file: TextIO) -> None:
+    print("\nLoad time by stage:", file=file)
+    for stage, duration in report.timings.items():
+        print(f"  {stage:<20} {duration * 1000:10.2f} ms", file=file)
+    print("\nCourse load time by step, summed over all courses:", file=file)
+    for stage, duration in report.stage_totals().items():
+        print(f"  {stage:<20} {duration * 1000:10.2f} ms", file=file)
+    print("\nSlowest courses (yaml / roster / validation):", file=file)
+    for course in report.slowest_courses(top):
+        steps = " / ".join(
+            f"{course.timings.get(stage, 0.0) * 1000:.2f}"
+            for stage in ("yaml", "roster", "validation")
+        )
+        print(
+            f"  {course.course:<40} {course.duration * 1000:10.2f} ms ({steps} ms)",
+            file=file,
+        )
+    print("\nLargest rosters:", file=file)
+    for course in report.largest_rosters(top):
+        print(
+            f"  {course.course:<40} {course.members:10d} ({course.roster_file})",
+            file=file,
+        )
+
+
+def shard_plan(args: argparse.Namespace) -> int:
+    import json
+
+    from .schema import ServerConfig
+    from .sharding import plan_shards
+
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    plan = plan_shards(
+        server_config,
+        args.shards,
+        by=args.by,
+        weighted=args.weighted,
+        load_factor=args.load_factor,
+    )
+    print(
+        f"{'shard':>5} {'courses':>8} {'users':>8} {'cpu':>10} {'mem':>10}",
+        file=sys.stderr,
+    )
+    for index, shard in enumerate(plan.shards):
+        print(
+            f"{index:>5} {shard['courses']:>8} {shard['users']:>8} "
+            f"{shard['cpu_guarantee']:>10.2f} {shard['mem_guarantee'] / 1024**3:>9.1f}G",
+            file=sys.stderr,
+        )
+    balance = ", ".join(f"{name} {value:.3f}" for name, value in plan.balance.items())
+    print(f"Imbalance (largest / average): {balance}", file=sys.stderr)
+    if plan.users_on_multiple_shards:
+        print(
+            f"{plan.users_on_multiple_shards} users have courses on several shards",
+            file=sys.stderr,
+        )
+    if args.previous:
+        with open(args.previous, "r") as file:
+            previous = json.load(file)
+        if previous.get("by") != args.by or not previous.get("assignments"):
+            print(
+                "The previous plan has no assignments of the same kind to compare with",
+                file=sys.stderr,
+            )
+        else:
+            print(
+                f"{plan.count_moved(previous['assignments'])} of "
+                f"{len(plan.assignments)} {args.by}s move to another shard",
+                file=sys.stderr,
+            )
+
+    output = json.dumps(plan.as_dict(include_assignments=args.assignments), indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 0
+
+
+def capacity_plan(args: argparse.Namespace) -> int:
+    import json
+
+    from .capacity import plan_capacity
+    from .schema import ServerConfig
+
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    plan = plan_capacity(
+        server_config,
+        args.node_cpu,
+        args.node_mem,
+        nodes=args.nodes,
+        exam_period=args.exam_period,
+        wave_size=args.wave_size,
+        spawn_rate=args.spawn_rate,
+    )
+    print(
+        f"Capacity: {plan.cpu_capacity:.2f} CPU, {plan.mem_capacity / 1024**3:.1f}G",
+        file=sys.stderr,
+    )
+    for period in plan.periods:
+        print(
+            f"Exam period {period.exam_period}: {period.users} users, "
+            f"{period.total_cpu:.2f} CPU ({period.cpu_utilization:.0%}), "
+            f"{period.total_mem / 1024**3:.1f}G ({period.mem_utilization:.0%})"
+            f"{'' if period.fits else ', exceeds the capacity'}",
+            file=sys.stderr,
+        )
+    overflow = next((wave for wave in plan.waves if not wave.fits), None)
+    print(
+        f"{len(plan.waves)} waves admitted over {plan.duration:.0f}s"
+        + (
+            f", the capacity is exceeded from wave {overflow.index} at "
+            f"{overflow.offset:.0f}s"
+            if overflow
+            else ""
+        ),
+        file=sys.stderr,
+    )
+
+    output = json.dumps(plan.as_dict(), indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 0 if all(period.fits for period in plan.periods) else 1
+
+
+def submissions(args: argparse.Namespace) -> int:
+    import json
+    import time
+
+    from .schema import ServerConfig
+    from .submissions import SubmissionScanner
+
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    scanner = SubmissionScanner(
+        server_config,
+        args.volume_root,
+        max_workers=args.workers,
+        include_feedback=not args.no_feedback,
+    )
+    course_keys = parse_course_keys(args.course, server_config)
+    if course_keys is None:
+        return 2
+    while True:
+        reports = scanner.scan(course_keys or None)
+        for report in reports:
+            if report.error:
+                print(f"{report.course}: ERROR {report.error}", file=sys.stderr)
+                continue
+            last_modified = (
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(report.last_modified))
+                if report.last_modified is not None
+                else "-"
+            )
+            print(
+                f"{report.course}: {report.submitted}/{len(report.users)} submitted, "
+                f"{report.size / 1024**2:.1f}M, last modified {last_modified}",
+                file=sys.stderr,
+            )
+        print(
+            f"Scanned in {scanner.stats.duration:.2f}s, {scanner.stats.listed} "
+            f"directories read, {scanner.stats.reused} unchanged",
+            file=sys.stderr,
+        )
+        output = json.dumps(
+            [report.as_dict(include_users=args.users) for report in reports], indent=2
+        )
+        if args.output == "-":
+            print(output)
+        else:
+            with open(args.output, "w") as file:
+                file.write(output)
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+    return 1 if any(report.error for report in reports) else 0
+
+
+def parse_volume_roots(volumes: List[str]) -> Optional[Dict[str, str]]:
+    volume_roots = dict()
+    for volume in volumes:
+        name, _, root = volume.partition("=")
+        if not root:
+            print(f"Invalid volume {volume!r}, expected NAME=PATH", file=sys.stderr)
+            return None
+        volume_roots[name] = root
+    return volume_roots
+
+
+def parse_course_keys(
+    courses: List[str], server_config: "ServerConfig"
+) -> Optional[List[Tuple[str, str, str]]]:
+    configured = {
+        ".".join(view.course_key): view.course_key
+        for view in server_config.nbgrader.course_views
+    }
+    unknown = [course for course in courses if course not in configured]
+    if unknown:
+        print(
+            f"Unknown course(s) {', '.join(unknown)}, expected NAME.SEMESTER.PERIOD of an "
+            "active course",
+            file=sys.stderr,
+        )
+        return None
+    return [configured[course] for course in courses]
+
+
+def archive(args: argparse.Namespace) -> int:
+    import json
+
+    from .archive import Archiver
+    from .schema import ServerConfig
+
+    volume_roots = parse_volume_roots(args.volume)
+    if volume_roots is None:
+        return 2
+    server_config = ServerConfig.from_yaml_file(
+        args.config_file, max_workers=args.workers
+    )
+    course_keys = parse_course_keys(args.course, server_config)
+    if course_keys is None:
+        return 2
+    try:
+        archiver = Archiver(
+            server_config,
+            volume_roots,
+            args.output_dir,
+            course_keys=course_keys or None,
+            include_inbound=not args.no_inbound,
+            compresslevel=args.compress_level,
+            max_workers=args.workers,
+            verify=args.verify,
+        )
+    except ValueError as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    def progress(report):
+        print(
+            f"{report.processed} students, {report.created} archived, "
+            f"{report.skipped} already archived, "
+            f"{report.throughput / 1024**2:.1f}M/s",
+            file=sys.stderr,
+        )
+
+    report = archiver.run(progress=progress)
+    output = json.dumps(report.as_dict(), indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as file:
+            file.write(output)
+    return 1 if report.errors else 0
+
+
+def add_config_arguments(
+    parser: argparse.ArgumentParser,
+    workers_help: str = "Threads used to load the course files",
+) -> None:
+    parser.add_argument(
+        "config_file",
+        nargs="?",
+        default=DEFAULT_CONFIG_FILE,
+        help=f"Path of the server config file (default: {DEFAULT_CONFIG_FILE})",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="Output file, '-' for stdout (default)"
+    )
+    parser.add_argument("--workers", type=int, default=1, help=workers_help)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="e2x-exam-hub", description="Tools for the e2x exam hub configuration"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser(
+        "export-mounts",
+        help="Export the volume mounts of all course members as JSON lines",
+    )
+    add_config_arguments(export_parser)
+    export_parser.set_defaults(func=export_mounts)
+
+    prepull_parser = subparsers.add_parser(
+        "prepull-manifest",
+        help="Write the distinct images of all active courses as a pre-puller manifest",
+    )
+    add_config_arguments(prepull_parser)
+    prepull_parser.set_defaults(func=prepull_manifest)
+
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Validate the config and all course files and report every error",
+    )
+    add_config_arguments(check_parser)
+    check_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Show the load time per stage, the slowest courses and the largest rosters",
+    )
+    check_parser.add_argument(
+        "--top", type=int, default=10, help="Number of courses listed in the profile"
+    )
+    check_parser.add_argument(
+        "--json", action="store_true", help="Print the full report as JSON"
+    )
+    check_parser.add_argument(
+        "--strict", action="store_true", help="Also fail on warnings"
+    )
+    check_parser.set_defaults(func=check)
+
+    shard_parser = subparsers.add_parser(
+        "shard-plan",
+        help="Split the users or courses across several hubs and report the balance",
+    )
+    add_config_arguments(shard_parser)
+    shard_parser.add_argument(
+        "--shards", type=int, required=True, help="Number of hubs"
+    )
+    shard_parser.add_argument(
+        "--by",
+        choices=["user", "course"],
+        default="user",
+        help="Split the users of all courses or whole courses (default: user)",
+    )
+    shard_parser.add_argument(
+        "--weighted",
+        action="store_true",
+        help="Balance the CPU and memory guarantees instead of the number of keys",
+    )
+    shard_parser.add_argument(
+        "--load-factor",
+        type=float,
+        default=0.25,
+        help="How far above the average a shard may be loaded in a weighted plan",
+    )
+    shard_parser.add_argument(
+        "--assignments",
+        action="store_true",
+        default=None,
+        help="Include the assignments in the plan even if it is not weighted",
+    )
+    shard_parser.add_argument(
+        "--previous",
+        metavar="PLAN",
+        help="A previous plan to count the users or courses that move",
+    )
+    shard_parser.set_defaults(func=shard_plan)
+
+    capacity_parser = subparsers.add_parser(
+        "capacity-plan",
+        help="Compare the guaranteed resources with the cluster capacity and write a "
+        "staggered admission schedule",
+    )
+    add_config_arguments(capacity_parser)
+    capacity_parser.add_argument(
+        "--node-cpu", required=True, help="Allocatable CPU of a node, e.g. 16 or 15500m"
+    )
+    capacity_parser.add_argument(
+        "--node-mem", required=True, help="Allocatable memory of a node, e.g. 64G"
+    )
+    capacity_parser.add_argument(
+        "--nodes", type=int, default=1, help="Number of nodes (default: 1)"
+    )
+    capacity_parser.add_argument(
+        "--exam-period", help="Only schedule the courses of this exam period"
+    )
+    capacity_parser.add_argument(
+        "--wave-size", type=int, default=50, help="Users per wave (default: 50)"
+    )
+    capacity_parser.add_argument(
+        "--spawn-rate",
+        type=float,
+        default=1.0,
+        help="Users admitted per second (default: 1)",
+    )
+    capacity_parser.set_defaults(func=capacity_plan)
+
+    submissions_parser = subparsers.add_parser(
+        "submissions",
+        help="Report which course members submitted, from the exchange inbound directories",
+    )
+    add_config_arguments(submissions_parser)
+    submissions_parser.set_defaults(workers=8)
+    submissions_parser.add_argument(
+        "--volume-root",
+        required=True,
+        help="Local directory where the exchange volume is mounted",
+    )
+    submissions_parser.add_argument(
+        "--course",
+        action="append",
+        default=[],
+        metavar="NAME.SEMESTER.PERIOD",
+        help="Only scan this course. Can be given multiple times",
+    )
+    submissions_parser.add_argument(
+        "--users", action="store_true", help="Include the status of every course member"
+    )
+    submissions_parser.add_argument(
+        "--no-feedback", action="store_true", help="Do not count the feedback"
+    )
+    submissions_parser.add_argument(
+        "--watch",
+        type=float,
+        metavar="SECONDS",
+        help="Rescan every SECONDS until interrupted. Only changed directories are read",
+    )
+    submissions_parser.set_defaults(func=submissions)
+
+    provision_parser = subparsers.add_parser(
+        "provision",
+        help="Create the home, temp and exchange directories of all course members",
+    )
+    add_config_arguments(
+        provision_parser,
+        workers_help="Threads used to load the course files and to create the "
+        "directories (default: 8)",
+    )
+    provision_parser.set_defaults(workers=8)
+    provision_parser.add_argument(
+        "--volume",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Local directory of a volume. Can be given multiple times",
+    )
+    provision_parser.add_argument("--uid", type=int, help="Owner of new directories")
+    provision_parser.add_argument("--gid", type=int, help="Group of new directories")
+    provision_parser.add_argument(
+        "--mode", help="Octal permissions of new directories, e.g. 0770"
+    )
+    provision_parser.add_argument(
+        "--writable-only",
+        action="store_true",
+        help="Only create the directories of writable mounts",
+    )
+    provision_parser.add_argument(
+        "--dry-run", action="store_true", help="Only report what would be created"
+    )
+    provision_parser.set_defaults(func=provision)
+
+    archive_parser = subparsers.add_parser(
+        "archive",
+        help="Archive the home directory and submissions of every course member",
+    )
+    add_config_arguments(
+        archive_parser,
+        workers_help="Threads used to load the course files and to write the archives "
+        "(default: 4)",
+    )
+    archive_parser.set_defaults(workers=4)
+    archive_parser.add_argument(
+        "--output-dir",
+        required=True,
+        help="Directory for the archives and the manifest. Rerun with the same "
+        "directory to resume",
+    )
+    archive_parser.add_argument(
+        "--volume",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Local directory of a volume. Can be given multiple times",
+    )
+    archive_parser.add_argument(
+        "--course",
+        action="append",
+        default=[],
+        metavar="NAME.SEMESTER.PERIOD",
+        help="Only archive this course. Can be given multiple times",
+    )
+    archive_parser.add_argument(
+        "--no-inbound", action="store_true", help="Only archive the home directories"
+    )
+    archive_parser.add_argument(
+        "--compress-level",
+        type=int,
+        choices=range(1, 10),
+        default=6,
+        help="gzip compression level (default: 6)",
+    )
+    archive_parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the checksums of existing archives before skipping them",
+    )
+    archive_parser.set_defaults(func=archive)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,35 @@
+import asyncio
+import functools
 import os
-from typing import Dict, List, Union
+import time
+from datetime import datetime
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
-from traitlets import Unicode
+from traitlets import Bool, Enum, Float, Integer, Unicode
 from traitlets.config import Config, LoggingConfigurable
 
-from .schema import BaseCourse, ServerConfig, StudentCourse
+from . import metrics
+from .admission import AdmissionController, load_admission_schedule
+from .export import MountPlan, iter_mount_plans
+from .reload import ConfigReloader
+from .schema import BaseCourse, ServerConfig, StudentCourse, UserDiff
+from .schema.roster import RosterReport
+from .schema.shard import ShardSpec
+from .schema.startup import StartupScript
+from .spawn import SpawnProfile, resolve_spawn_profile
+
+T = TypeVar("T")
 
 
 class ExamHub(LoggingConfigurable):
@@ -16,11 +41,261 @@ class ExamHub(LoggingConfigurable):
         "config-exam.yaml", help="Name of the configuration file"
     ).tag(config=True)
 
-    server_config: ServerConfig
+    config_load_workers = Integer(
+        1,
+        help="Number of threads used to load the course files in parallel",
+    ).tag(config=True)
+
+    config_change_detection = Enum(
+        ["mtime", "hash"],
+        "mtime",
+        help="How changed config files are detected on reload. Either by modification time "
+        "and size or by content hash",
+    ).tag(config=True)
+
+    config_cache_dir = Unicode(
+        "",
+        help="Directory for a compiled snapshot of the configuration, which is used on start "
+        "as long as no config file changed. Leave empty to disable the snapshot",
+    ).tag(config=True)
+
+    lazy_course_loading = Bool(
+        False,
+        help="Whether only the course rosters are loaded on start. The full course configs "
+        "are then loaded when a member of the course first logs in and kept in a bounded "
+        "cache. The config snapshot is not used in this mode",
+    ).tag(config=True)
+
+    course_cache_size = Integer(
+        64,
+        help="Number of course configs kept loaded with lazy_course_loading",
+    ).tag(config=True)
+
+    nbgrader_config_file = Unicode(
+        "/etc/jupyter/nbgrader_config.py",
+        help="The nbgrader config file in the single-user server that the exchange settings "
+        "of a course are appended to",
+    ).tag(config=True)
+
+    metrics_collector = Enum(
+        ["none", "memory", "prometheus"],
+        "none",
+        help="Where to record metrics. 'memory' keeps them in process, 'prometheus' "
+        "registers them in the default prometheus_client registry used by JupyterHub",
+    ).tag(config=True)
+
+    load_config_on_init = Bool(
+        True,
+        help="Whether the configuration is loaded when the ExamHub is created. If False, it "
+        "has to be loaded with 'await ExamHub.load()' before it is used",
+    ).tag(config=True)
+
+    shard_count = Integer(
+        1,
+        help="Number of hubs the exam users are split across. 1 disables sharding",
+    ).tag(config=True)
+
+    shard_index = Integer(
+        0,
+        help="The shard served by this hub, from 0 to shard_count - 1",
+    ).tag(config=True)
+
+    shard_by = Enum(
+        ["user", "course"],
+        "user",
+        help="Whether the users of all courses or whole courses are split across the hubs",
+    ).tag(config=True)
+
+    shard_plan_file = Unicode(
+        "",
+        help="A plan written by 'e2x-exam-hub shard-plan'. If set, it defines the number of "
+        "shards and how they are split, and shard_count and shard_by are ignored",
+    ).tag(config=True)
+
+    spawn_rate = Float(
+        0.0,
+        help="Number of spawns admitted per second by admit_spawner. 0 disables the limit",
+    ).tag(config=True)
+
+    spawn_burst = Integer(
+        1,
+        help="Number of spawns admit_spawner admits at once after a quiet period",
+    ).tag(config=True)
+
+    spawn_max_waiting = Integer(
+        0,
+        help="Number of spawns that can wait for admission at the same time. Further "
+        "spawns are rejected. 0 means no limit",
+    ).tag(config=True)
+
+    spawn_max_concurrent = Integer(
+        0,
+        help="Number of spawns admitted by admit_spawner that can be starting at the same "
+        "time. Further spawns wait until a server started or failed to start. 0 means no "
+        "limit",
+    ).tag(config=True)
+
+    admission_schedule_file = Unicode(
+        "",
+        help="A plan written by 'e2x-exam-hub capacity-plan'. Users are not admitted before "
+        "the offset of their wave after exam_start_time",
+    ).tag(config=True)
+
+    exam_start_time = Unicode(
+        "",
+        help="The start of the exam in ISO 8601 format, e.g. 2025-02-03T09:00:00+01:00. "
+        "The admission schedule is relative to it",
+    ).tag(config=True)
+
+    reloader: ConfigReloader
+    admission: AdmissionController
+    shard: Optional[ShardSpec]
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.server_config = ServerConfig.from_yaml_file(self.config_file_path)
+        collector_classes = dict(
+            memory=metrics.InMemoryCollector, prometheus=metrics.PrometheusCollector
+        )
+        collector_class = collector_classes.get(self.metrics_collector)
+        # Metrics can only be registered once, so keep a collector set up by another
+        # instance
+        if collector_class and not isinstance(metrics.get_collector(), collector_class):
+            metrics.set_collector(collector_class())
+        if self.shard_plan_file:
+            self.shard = ShardSpec.from_plan_file(
+                self.shard_plan_file, self.shard_index
+            ).validate()
+        elif self.shard_count > 1:
+            self.shard = ShardSpec(
+                self.shard_count, self.shard_index, self.shard_by
+            ).validate()
+        else:
+            self.shard = None
+        self.reloader = ConfigReloader(
+            self.config_file_path,
+            max_workers=self.config_load_workers,
+            use_hash=self.config_change_detection == "hash",
+            cache_dir=self.config_cache_dir or None,
+            load=self.load_config_on_init,
+            shard=self.shard,
+            lazy=self.lazy_course_loading,
+            course_cache_size=self.course_cache_size,
+        )
+        self._inflight: Dict[str, asyncio.Future] = dict()
+        self.admission = AdmissionController(
+            rate=self.spawn_rate,
+            burst=self.spawn_burst,
+            max_waiting=self.spawn_max_waiting,
+            schedule=load_admission_schedule(self.admission_schedule_file)
+            if self.admission_schedule_file
+            else None,
+            exam_start=datetime.fromisoformat(self.exam_start_time).timestamp()
+            if self.exam_start_time
+            else None,
+            max_concurrent=self.spawn_max_concurrent,
+        )
+        self._release_tasks: Set[asyncio.Task] = set()
+        if self.reloader.server_config is not None:
+            self.log_roster_reports()
+
+    @property
+    def server_config(self) -> ServerConfig:
+        """
+        The current config snapshot. It is replaced as a whole on reload.
+
+        Returns:
+            ServerConfig: The current server config.
+
+        Raises:
+            RuntimeError: If the configuration is not loaded yet.
+        """
+        server_config = self.reloader.server_config
+        if server_config is None:
+            raise RuntimeError(
+                "The configuration is not loaded yet. Call 'await ExamHub.load()' first"
+            )
+        # Cheap unless a course started or ended since the last access
+        server_config.evict_inactive_courses()
+        return server_config
+
+    @property
+    def reload_count(self) -> int:
+        return self.reloader.reload_count
+
+    @property
+    def last_reload_duration(self) -> Optional[float]:
+        return self.reloader.last_reload_duration
+
+    def reload_config(self, force: bool = False) -> bool:
+        """
+        Reload the configuration if the config file or any course file changed.
+        If the new configuration can not be loaded, the current one is kept. If no
+        configuration is loaded yet, it is loaded.
+
+        Args:
+            force (bool): Whether to reload all files even if they did not change.
+
+        Returns:
+            bool: True if a new configuration was loaded, False otherwise.
+        """
+        if self.reloader.server_config is None:
+            try:
+                self._load()
+            except Exception:
+                self.log.exception("Failed to load %s", self.config_file_path)
+                return False
+            return True
+        try:
+            reloaded = self.reloader.reload(force=force)
+        except Exception:
+            self.log.exception("Failed to reload %s", self.config_file_path)
+            return False
+        if reloaded:
+            self.log.info(
+                "Reloaded %s in %.3fs (%d users added, %d removed)",
+                self.config_file_path,
+                self.reloader.last_reload_duration,
+                len(self.reloader.last_user_diff.added),
+                len(self.reloader.last_user_diff.removed),
+            )
+            self.log_roster_reports()
+        return reloaded
+
+    def _load(self) -> ServerConfig:
+        server_config = self.reloader.load()
+        self.log_roster_reports()
+        return server_config
+
+    def get_roster_reports(self) -> Dict[str, RosterReport]:
+        """
+        The reports of reading the roster files of the active courses.
+
+        Returns:
+            Dict[str, RosterReport]: The roster report of each course by course ID.
+        """
+        return {
+            view.course_id: view.roster_report
+            for view in self.server_config.nbgrader.course_views
+            if view.roster_report is not None
+        }
+
+    def log_roster_reports(self) -> None:
+        """
+        Log a warning for every course whose roster file is missing or has malformed rows.
+        """
+        for course_id, report in self.get_roster_reports().items():
+            if report.missing:
+                self.log.warning(
+                    "Roster file %s of %s does not exist", report.file, course_id
+                )
+            elif report.malformed:
+                self.log.warning(
+                    "Skipped %d malformed row(s) in roster file %s of %s: %s",
+                    report.malformed,
+                    report.file,
+                    course_id,
+                    "; ".join(report.errors),
+                )
 
     @property
     def config_file_path(self) -> str:
@@ -42,25 +317,109 @@ class ExamHub(LoggingConfigurable):
         Returns:
             None
         """
-        config.KubeSpawner.image = self.server_config.image.full_image_name
-        config.KubeSpawner.image_pull_policy = self.server_config.image.pullPolicy
+        for name, value in self.server_config.get_spawner_settings().items():
+            setattr(config.KubeSpawner, name, value)
+
+    def get_spawner_settings(self, username: str) -> Dict[str, Union[str, float]]:
+        """
+        Resolve the image and resource settings of a user. They are taken from the first course
+        of the user, falling back to the global settings for anything the course does not set.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            Dict[str, Union[str, float]]: The KubeSpawner attributes and their values.
+        """
+        server_config = self.server_config
+        courses = server_config.nbgrader.get_user_courses(username)
+        return server_config.get_spawner_settings(courses[0] if courses else None)
+
+    def apply_spawner_settings(self, spawner) -> None:
+        """
+        Set the image and resources of a spawner to those of the course of its user.
+        Meant to be called from a KubeSpawner pre_spawn_hook.
+
+        Args:
+            spawner (KubeSpawner): The spawner of the user's server.
+        """
+        for name, value in self.get_spawner_settings(spawner.user.name).items():
+            setattr(spawner, name, value)
+
+    async def admit_spawner(self, spawner) -> None:
+        """
+        Wait until the spawn of a user's server is admitted by the admission controller.
+        Can be used as the pre_spawn_hook of the spawner, e.g.
+        c.Spawner.pre_spawn_hook = exam_hub.admit_spawner. With spawn_max_concurrent, the
+        spawn holds an admission slot until it is no longer pending.
+
+        Args:
+            spawner (KubeSpawner): The spawner of the user's server.
+
+        Raises:
+            AdmissionError: If too many spawns are already waiting.
+        """
+        waited = await self.admission.admit(spawner.user.name)
+        if waited >= 1:
+            self.log.info(
+                "Admitted the spawn of %s after %.1fs", spawner.user.name, waited
+            )
+        if self.admission.max_concurrent:
+            task = asyncio.ensure_future(self._release_when_started(spawner))
+            self._release_tasks.add(task)
+            task.add_done_callback(self._release_tasks.discard)
 
-        config.KubeSpawner.cpu_guarantee = self.server_config.resources.cpu_guarantee
-        config.KubeSpawner.cpu_limit = self.server_config.resources.cpu_limit
-        config.KubeSpawner.mem_guarantee = self.server_config.resources.mem_guarantee
-        config.KubeSpawner.mem_limit = self.server_config.resources.mem_limit
+    async def _release_when_started(self, spawner) -> None:
+        """
+        Return the admission slot of a spawn once JupyterHub no longer reports it as
+        pending, i.e. the server responds or the spawn failed. The slot is returned after
+        the start and HTTP timeouts of the spawner at the latest.
+        """
+        deadline = time.monotonic() + getattr(spawner, "start_timeout", 60)
+        deadline += getattr(spawner, "http_timeout", 30)
+        try:
+            while (
+                getattr(spawner, "pending", None) == "spawn"
+                and time.monotonic() < deadline
+            ):
+                await asyncio.sleep(1)
+        finally:
+            self.admission.release()
 
-    def get_hub_users(self) -> List[str]:
+    def get_hub_users(self) -> FrozenSet[str]:
         """
-        Returns a list of all users that are members of the courses configured in the JupyterHub.
+        Returns all users that are members of the courses configured in the JupyterHub
+        that are currently active. The set is computed once per configuration version and
+        change of the active courses.
 
         Returns:
-            List[str]: A list of usernames.
+            FrozenSet[str]: The usernames, each listed once.
+        """
+        return self.server_config.nbgrader.get_active_users()
+
+    def get_hub_user_diff(self, previous_config: ServerConfig) -> UserDiff:
         """
-        users = []
-        for course in self.server_config.nbgrader.student_courses:
-            users.extend(course.course_members)
-        return users
+        Returns the users added and removed since a previous configuration version, so the
+        allowed users only need to be updated for the delta.
+
+        Args:
+            previous_config (ServerConfig): The previous configuration version.
+
+        Returns:
+            UserDiff: The added and removed usernames.
+        """
+        return self.server_config.nbgrader.diff_users(previous_config.nbgrader)
+
+    @property
+    def last_user_diff(self) -> Optional[UserDiff]:
+        """
+        The users added and removed by the last reload that changed the configuration.
+
+        Returns:
+            Optional[UserDiff]: The added and removed usernames, or None before the first
+            reload.
+        """
+        return self.reloader.last_user_diff
 
     def get_volume_mounts(
         self, course: BaseCourse, username: str
@@ -78,9 +437,29 @@ class ExamHub(LoggingConfigurable):
         """
         return self.server_config.mounts.get_mounts(course, username)
 
+    def iter_volume_mounts(self) -> Iterator[MountPlan]:
+        """
+        Iterate over the volume mounts of every member of every active course.
+
+        Yields:
+            MountPlan: A dictionary with the course, the username and the volume mounts of one
+            course member.
+        """
+        return iter_mount_plans(self.server_config)
+
+    @property
+    def mount_cache_stats(self) -> Dict[str, int]:
+        """
+        The hit and miss statistics of the volume mount cache of the current configuration.
+
+        Returns:
+            Dict[str, int]: The hits, misses, current size and maximum size of the cache.
+        """
+        return self.server_config.mounts.cache_stats
+
     def get_user_courses(self, username: str) -> List[StudentCourse]:
         """
-        Retrieve the list of courses for a given student.
+        Retrieve the list of currently active courses for a given student.
 
         Args:
             username (str): The username of the student for whom to retrieve courses.
@@ -111,3 +490,176 @@ class ExamHub(LoggingConfigurable):
             List[str]: A list of commands to be executed
         """
         return course.all_commands
+
+    def get_spawn_profile(self, username: str) -> SpawnProfile:
+        """
+        Resolve the courses, image, resources, volume mounts and commands of a user in a
+        single pass over the current configuration.
+
+        Args:
+            username (str): The username of the user whose server is spawned.
+
+        Returns:
+            SpawnProfile: The resolved profile including the duration of each stage.
+        """
+        return self._resolve_spawn_profile(self.server_config, username)
+
+    def _resolve_spawn_profile(
+        self,
+        server_config: ServerConfig,
+        username: str,
+        courses: Optional[List[StudentCourse]] = None,
+    ) -> SpawnProfile:
+        profile = resolve_spawn_profile(server_config, username, courses)
+        self.log.debug(
+            "Resolved spawn profile of %s in %.6fs (%s)",
+            username,
+            profile.timings["total"],
+            ", ".join(
+                f"{stage}: {duration:.6f}s"
+                for stage, duration in profile.timings.items()
+                if stage != "total"
+            ),
+        )
+        return profile
+
+    async def resolve_spawn_profile(self, username: str) -> SpawnProfile:
+        """
+        Async variant of get_spawn_profile for use in a KubeSpawner pre_spawn_hook.
+        Waits for the configuration to be loaded. With lazy_course_loading, courses of the
+        user that are not loaded yet are read in an executor first, so the resolution
+        itself works on in-memory data only.
+
+        Args:
+            username (str): The username of the user whose server is spawned.
+
+        Returns:
+            SpawnProfile: The resolved profile including the duration of each stage.
+        """
+        server_config, courses = await self._load_user_courses(username)
+        return self._resolve_spawn_profile(server_config, username, courses)
+
+    def get_startup_script(
+        self, course: Optional[StudentCourse] = None
+    ) -> StartupScript:
+        """
+        Retrieve a single startup script with the server commands, the course commands and
+        the nbgrader exchange settings of a course. Duplicate commands are removed.
+
+        Args:
+            course (Optional[StudentCourse]): The course. Defaults to None, which only includes
+                the server commands.
+
+        Returns:
+            StartupScript: The script. Its command attribute runs it in one step.
+        """
+        return self.server_config.get_startup_script(course, self.nbgrader_config_file)
+
+    def _run_shared(self, name: str, func: Callable[[], T]) -> "asyncio.Future[T]":
+        """
+        Run a blocking function in the default executor. Concurrent callers with the same
+        name share a single in-flight call instead of each starting their own.
+        """
+        future = self._inflight.get(name)
+        if future is None or future.done():
+            future = asyncio.get_running_loop().run_in_executor(None, func)
+            self._inflight[name] = future
+        # Shield the shared call, so a cancelled caller does not cancel it for the others
+        return asyncio.shield(future)
+
+    async def _load_user_courses(
+        self, username: str
+    ) -> Tuple[ServerConfig, List[StudentCourse]]:
+        """
+        Wait for the configuration and get the active courses of a user. In lazy mode, the
+        courses that are not in the course cache are loaded in the default executor and
+        used as they are returned, so nothing is read on the event loop even if a course is
+        evicted again in the meantime. Concurrent misses of the same course share a single
+        load.
+        """
+        server_config = await self.load()
+        server_config.evict_inactive_courses()
+        nbgrader = server_config.nbgrader
+        if not nbgrader.lazy:
+            return server_config, nbgrader.get_user_courses(username)
+        courses = []
+        for view in nbgrader.get_active_user_course_views(username):
+            course = nbgrader.get_cached_course(view.course_key)
+            if course is None:
+                # The config is part of the name, so a load of a replaced config is not shared
+                course = await self._run_shared(
+                    f"course-{id(nbgrader)}-{view.course_key}",
+                    lambda view=view: view.course,
+                )
+            courses.append(course)
+        return server_config, courses
+
+    async def load(self) -> ServerConfig:
+        """
+        Load the configuration without blocking the event loop, unless it is already loaded.
+
+        Returns:
+            ServerConfig: The current server config.
+        """
+        if self.reloader.server_config is not None:
+            return self.reloader.server_config
+        return await self._run_shared("load", self._load)
+
+    async def reload_config_async(self, force: bool = False) -> bool:
+        """
+        Async variant of reload_config. The files are checked and parsed in an executor.
+
+        Args:
+            force (bool): Whether to reload all files even if they did not change.
+
+        Returns:
+            bool: True if a new configuration was loaded, False otherwise.
+        """
+        return await self._run_shared(
+            f"reload-{force}", functools.partial(self.reload_config, force=force)
+        )
+
+    async def get_hub_users_async(self) -> FrozenSet[str]:
+        """
+        Async variant of get_hub_users that waits for the configuration to be loaded.
+        """
+        await self.load()
+        return self.get_hub_users()
+
+    async def get_user_courses_async(self, username: str) -> List[StudentCourse]:
+        """
+        Async variant of get_user_courses that waits for the configuration and the courses of
+        the user to be loaded.
+        """
+        return (await self._load_user_courses(username))[1]
+
+    async def get_volume_mounts_async(
+        self, course: BaseCourse, username: str
+    ) -> List[Dict[str, Union[str, bool]]]:
+        """
+        Async variant of get_volume_mounts that waits for the configuration to be loaded.
+        """
+        await self.load()
+        return self.get_volume_mounts(course, username)
+
+    async def get_spawner_settings_async(
+        self, username: str
+    ) -> Dict[str, Union[str, float]]:
+        """
+        Async variant of get_spawner_settings that waits for the configuration and the
+        courses of the user to be loaded.
+        """
+        server_config, courses = await self._load_user_courses(username)
+        return server_config.get_spawner_settings(courses[0] if courses else None)
+
+    async def get_startup_script_async(
+        self, course: Optional[StudentCourse] = None
+    ) -> StartupScript:
+        """
+        Async variant of get_startup_script. Rendering a script for the first time is done in
+        an executor.
+        """
+        await self.load()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.get_startup_script, course
+        )
@@ -0,0 +1,81 @@
+import json
+import re
+from typing import Any, Dict, Iterator, List, TextIO, Union
+
+from .schema import ServerConfig
+from .schema.templates import render_mount_templates
+
+MountPlan = Dict[str, Union[str, List[Dict[str, Union[str, bool]]]]]
+
+
+def iter_mount_plans(server_config: ServerConfig) -> Iterator[MountPlan]:
+    """
+    Iterate over the volume mounts of every member of every active course.
+
+    The mount templates of each course are compiled once and rendered for every member. The
+    plans are produced one at a time and bypass the mount cache, so memory stays constant
+    regardless of the size of the rosters.
+
+    Args:
+        server_config (ServerConfig): The server config to export the mounts of.
+
+    Yields:
+        MountPlan: The course, username and volume mounts of one course member.
+    """
+    for view in server_config.nbgrader.course_views:
+        course = view.course
+        templates = server_config.mounts.get_templates(course)
+        for username in course.course_members:
+            yield dict(
+                course_id=course.course_id,
+                name=course.name,
+                semester_id=course.semester_id,
+                exam_period=course.exam_period,
+                username=username,
+                mounts=render_mount_templates(templates, username),
+            )
+
+
+def write_mount_plans(server_config: ServerConfig, file: TextIO) -> int:
+    """
+    Write the volume mounts of every member of every active course as JSON lines.
+
+    Args:
+        server_config (ServerConfig): The server config to export the mounts of.
+        file (TextIO): The file to write to.
+
+    Returns:
+        int: The number of written mount plans.
+    """
+    count = 0
+    for plan in iter_mount_plans(server_config):
+        file.write(json.dumps(plan))
+        file.write("\n")
+        count += 1
+    return count
+
+
+def build_prepuller_manifest(server_config: ServerConfig) -> Dict[str, Any]:
+    """
+    Build a pre-puller manifest with every distinct image of the active courses.
+
+    The manifest has the layout of the prePuller.extraImages section of the values of the
+    zero-to-jupyterhub Helm chart, so it can be passed to helm as an extra values file.
+
+    Args:
+        server_config (ServerConfig): The server config to collect the images from.
+
+    Returns:
+        Dict[str, Any]: The pre-puller manifest.
+    """
+    extra_images = dict()
+    for image in server_config.get_images():
+        key = re.sub(r"[^a-z0-9]+", "-", image.full_image_name.split("/")[-1].lower())
+        key = key.strip("-")
+        unique_key = key
+        suffix = 1
+        while unique_key in extra_images:
+            suffix += 1
+            unique_key = f"{key}-{suffix}"
+        extra_images[unique_key] = dict(name=image.name, tag=image.tag)
+    return dict(prePuller=dict(extraImages=extra_images))
@@ -0,0 +1,280 @@
+import bisect
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+LATENCY_BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+# Name -> (type, description, histogram buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[Tuple[float, ...]]]] = {
+    "config_load_seconds": (
+        "histogram",
+        "Time to load the server config",
+        LATENCY_BUCKETS,
+    ),
+    "config_snapshot_hits_total": (
+        "counter",
+        "Config loads served from the compiled snapshot",
+        None,
+    ),
+    "config_snapshot_misses_total": (
+        "counter",
+        "Config loads that had to parse the source files",
+        None,
+    ),
+    "courses_load_seconds": (
+        "histogram",
+        "Time to load all active student courses",
+        LATENCY_BUCKETS,
+    ),
+    "courses_loaded_total": ("counter", "Student courses loaded from disk", None),
+    "course_materialize_seconds": (
+        "histogram",
+        "Time to load a student course on first use in lazy mode",
+        LATENCY_BUCKETS,
+    ),
+    "courses_materialized_total": (
+        "counter",
+        "Student courses loaded on first use in lazy mode",
+        None,
+    ),
+    "roster_load_seconds": (
+        "histogram",
+        "Time to load the user list of a course",
+        LATENCY_BUCKETS,
+    ),
+    "roster_size": ("histogram", "Number of users in a course roster", SIZE_BUCKETS),
+    "roster_malformed_rows_total": (
+        "counter",
+        "Roster rows skipped because they are malformed",
+        None,
+    ),
+    "user_courses_lookup_seconds": (
+        "histogram",
+        "Time to look up the courses of a user",
+        LATENCY_BUCKETS,
+    ),
+    "user_courses_lookups_total": ("counter", "Lookups of the courses of a user", None),
+    "user_courses_lookup_misses_total": (
+        "counter",
+        "Lookups for users that are not a member of any course",
+        None,
+    ),
+    "mounts_seconds": (
+        "histogram",
+        "Time to get the volume mounts of a user",
+        LATENCY_BUCKETS,
+    ),
+    "mount_cache_hits_total": ("counter", "Volume mount cache hits", None),
+    "mount_cache_misses_total": ("counter", "Volume mount cache misses", None),
+    "mount_cache_evictions_total": (
+        "counter",
+        "Volume mount cache entries removed because their course is no longer active",
+        None,
+    ),
+    "spawn_admission_wait_seconds": (
+        "histogram",
+        "Time a spawn waited for admission",
+        LATENCY_BUCKETS + (30.0, 60.0, 300.0, 900.0),
+    ),
+    "spawn_admission_rejected_total": (
+        "counter",
+        "Spawns rejected because too many spawns were waiting",
+        None,
+    ),
+    "commands_seconds": (
+        "histogram",
+        "Time to assemble a list of commands",
+        LATENCY_BUCKETS,
+    ),
+}
+
+
+class MetricsCollector:
+    """
+    Receives the metrics of the exam hub. This base collector discards everything.
+
+    Subclasses override observe and increment to record the values.
+    """
+
+    enabled = False
+
+    def observe(self, name: str, value: float) -> None:
+        """
+        Record a value of a histogram.
+
+        Args:
+            name (str): The name of the metric as listed in METRICS.
+            value (float): The observed value.
+        """
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name (str): The name of the metric as listed in METRICS.
+            amount (float): The amount to increment the counter by.
+        """
+
+
+class InMemoryCollector(MetricsCollector):
+    """
+    Keeps counters and histograms in memory. Needs no external service.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = dict()
+        self._histograms: Dict[str, Dict[str, Any]] = dict()
+
+    def observe(self, name: str, value: float) -> None:
+        buckets = METRICS[name][2]
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = dict(count=0, sum=0.0, buckets=[0] * (len(buckets) + 1))
+                self._histograms[name] = histogram
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["buckets"][bisect.bisect_left(buckets, value)] += 1
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the current values of all metrics.
+
+        Returns:
+            Dict[str, Any]: The counters and histograms. Histogram buckets are cumulative and
+            keyed by their upper bound, like in Prometheus.
+        """
+        with self._lock:
+            histograms = dict()
+            for name, histogram in self._histograms.items():
+                cumulative = 0
+                buckets = dict()
+                bounds = METRICS[name][2] + (float("inf"),)
+                for bound, count in zip(bounds, histogram["buckets"]):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                histograms[name] = dict(
+                    count=histogram["count"], sum=histogram["sum"], buckets=buckets
+                )
+            return dict(counters=dict(self._counters), histograms=histograms)
+
+    def reset(self) -> None:
+        """
+        Reset all metrics.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class PrometheusCollector(MetricsCollector):
+    """
+    Records the metrics with prometheus_client, e.g. in the registry of JupyterHub.
+
+    Args:
+        registry: The prometheus_client registry to register the metrics in. Defaults to None,
+            which uses the default registry that JupyterHub exposes on /hub/metrics.
+        prefix (str): The prefix of all metric names.
+    """
+
+    enabled = True
+
+    def __init__(self, registry=None, prefix: str = "e2x_exam_hub_"):
+        import prometheus_client
+
+        if registry is None:
+            registry = prometheus_client.REGISTRY
+        self._metrics = dict()
+        for name, (kind, description, buckets) in METRICS.items():
+            if kind == "histogram":
+                metric = prometheus_client.Histogram(
+                    prefix + name, description, buckets=buckets, registry=registry
+                )
+            else:
+                # prometheus_client appends _total to counters itself
+                metric = prometheus_client.Counter(
+                    prefix + name[: -len("_total")], description, registry=registry
+                )
+            self._metrics[name] = metric
+
+    def observe(self, name: str, value: float) -> None:
+        self._metrics[name].observe(value)
+
+    def increment(self, name: str, amount: float = 1) -> None:
+        self._metrics[name].inc(amount)
+
+
+_collector = MetricsCollector()
+
+
+def get_collector() -> MetricsCollector:
+    return _collector
+
+
+def set_collector(collector: MetricsCollector) -> None:
+    """
+    Set the collector that receives all metrics of the exam hub.
+
+    Args:
+        collector (MetricsCollector): The new collector.
+    """
+    global _collector
+    _collector = collector
+
+
+def observe(name: str, value: float) -> None:
+    _collector.observe(name, value)
+
+
+def increment(name: str, amount: float = 1) -> None:
+    _collector.increment(name, amount)
+
+
+class timer:
+    """
+    Context manager that records the duration of its block in a histogram.
+
+    Does not read the clock if the current collector is disabled.
+
+    Args:
+        name (str): The name of the histogram as listed in METRICS.
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self) -> "timer":
+        if _collector.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.start is not None:
+            _collector.observe(self.name, time.perf_counter() - self.start)
@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .export import iter_mount_plans
+from .schema import ServerConfig
+from .schema.roster import is_safe_username
+
+
+def is_inside(root: str, path: str) -> bool:
+    """
+    Whether a path is the root directory or below it, after resolving ".." components.
+    """
+    root = os.path.abspath(root)
+    return os.path.commonpath([root, os.path.abspath(path)]) == root
+
+
+class ProvisionReport:
+    """
+    Progress and result of provisioning the volume directories.
+
+    Attributes:
+        created (int): Directories that were created, or would be created in a dry run.
+        existing (int): Directories that already existed.
+        skipped (int): Mounts on volumes without a local root.
+        errors (Dict[str, str]): The error for each directory that could not be created.
+        dry_run (bool): Whether nothing was created.
+        duration (float): The time spent so far in seconds.
+    """
+
+    def __init__(self, dry_run: bool = False):
+        self.created = 0
+        self.existing = 0
+        self.skipped = 0
+        self.errors: Dict[str, str] = dict()
+        self.dry_run = dry_run
+        self.duration = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.created + self.existing + len(self.errors)
+
+    @property
+    def throughput(self) -> float:
+        """
+        The number of processed directories per second.
+        """
+        return self.processed / self.duration if self.duration else 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return dict(
+            created=self.created,
+            existing=self.existing,
+            skipped=self.skipped,
+            errors=dict(self.errors),
+            dry_run=self.dry_run,
+            duration=self.duration,
+            throughput=self.throughput,
+        )
+
+
+class Provisioner:
+    """
+    Creates the sub-paths of the volume mounts of all course members ahead of the exam.
+
+    The sub-paths are resolved against a local directory per volume, e.g. where the volume is
+    mounted on an admin machine. Directories are created in parallel and existing ones are left
+    untouched, so provisioning can be repeated safely.
+
+    Args:
+        server_config (ServerConfig): The config to provision the directories of.
+        volume_roots (Dict[str, str]): The local directory of each volume by volume name.
+            Mounts on other volumes are skipped.
+        uid (Optional[int]): The owner of created directories. Defaults to None, which keeps
+            the owner.
+        gid (Optional[int]): The group of created directories. Defaults to None, which keeps
+            the group.
+        mode (Optional[int]): The permissions of created directories. Defaults to None, which
+            uses the umask.
+        include_read_only (bool): Whether the sub-paths of read-only mounts (shares, feedback
+            and outbound) are created too. Defaults to True.
+        max_workers (int): The number of threads creating directories.
+        dry_run (bool): Whether to only report which directories would be created.
+    """
+
+    def __init__(
+        self,
+        server_config: ServerConfig,
+        volume_roots: Dict[str, str],
+        uid: Optional[int] = None,
+        gid: Optional[int] = None,
+        mode: Optional[int] = None,
+        include_read_only: bool = True,
+        max_workers: int = 8,
+        dry_run: bool = False,
+    ):
+        self.server_config = server_config
+        self.volume_roots = volume_roots
+        self.uid = uid
+        self.gid = gid
+        self.mode = mode
+        self.include_read_only = include_read_only
+        self.max_workers = max_workers
+        self.dry_run = dry_run
+        self._lock = threading.Lock()
+
+    def iter_directories(self, report: ProvisionReport) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate over the local directories of all mounts of all course members. Directories
+        shared by several users are only listed once. A username that is not a single directory
+        name, e.g. "../alice", and a sub-path that leaves the root of its volume are recorded
+        as errors instead.
+
+        Args:
+            report (ProvisionReport): The report to count skipped mounts and to record
+                invalid sub-paths in.
+
+        Yields:
+            Tuple[str, str]: The local root of the volume and the local path of a directory.
+        """
+        seen: Set[str] = set()
+        for plan in iter_mount_plans(self.server_config):
+            username = plan["username"]
+            if not is_safe_username(username):
+                report.errors[username] = (
+                    f"ValueError: Username {username!r} is not a valid directory name"
+                )
+                continue
+            for mount in plan["mounts"]:
+                if mount["readOnly"] and not self.include_read_only:
+                    continue
+                root = self.volume_roots.get(mount["name"])
+                if root is None:
+                    report.skipped += 1
+                    continue
+                path = os.path.normpath(os.path.join(root, mount["subPath"]))
+                if path in seen:
+                    continue
+                seen.add(path)
+                if not is_inside(root, path):
+                    report.errors[path] = (
+                        f"ValueError: Sub-path of {username} is outside of {root}"
+                    )
+                    continue
+                yield root, path
+
+    def _create_directory(self, root: str, path: str) -> bool:
+        if os.path.isdir(path):
+            return False
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"Volume root {root} does not exist")
+        if self.dry_run:
+            return True
+        missing: List[str] = []
+        parent = path
+        while parent and not os.path.isdir(parent):
+            missing.append(parent)
+            parent = os.path.dirname(parent)
+        os.makedirs(path, exist_ok=True)
+        for directory in missing:
+            if self.uid is not None or self.gid is not None:
+                os.chown(
+                    directory,
+                    -1 if self.uid is None else self.uid,
+                    -1 if self.gid is None else self.gid,
+                )
+            if self.mode is not None:
+                os.chmod(directory, self.mode)
+        return True
+
+    def _record(self, report: ProvisionReport, path: str, future: Future) -> None:
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                report.errors[path] = f"{type(error).__name__}: {error}"
+            elif future.result():
+                report.created += 1
+            else:
+                report.existing += 1
+
+    def run(
+        self,
+        progress: Optional[Callable[[ProvisionReport], None]] = None,
+        progress_interval: int = 1000,
+    ) -> ProvisionReport:
+        """
+        Create all directories.
+
+        Only a bounded number of directories is queued for the threads at a time, the mount
+        plans are generated as the directories are processed.
+
+        Args:
+            progress (Optional[Callable[[ProvisionReport], None]]): Called with the report
+                every progress_interval processed directories.
+            progress_interval (int): The number of directories between progress calls.
+
+        Returns:
+            ProvisionReport: The final report.
+        """
+        report = ProvisionReport(dry_run=self.dry_run)
+        start = time.perf_counter()
+        pending: Dict[Future, str] = dict()
+        next_progress = progress_interval
+
+        def collect(futures):
+            nonlocal next_progress
+            for future in futures:
+                self._record(report, pending.pop(future), future)
+            report.duration = time.perf_counter() - start
+            if progress is not None and report.processed >= next_progress:
+                next_progress = report.processed + progress_interval
+                progress(report)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for root, path in self.iter_directories(report):
+                pending[executor.submit(self._create_directory, root, path)] = path
+                if len(pending) >= self.max_workers * 4:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(list(pending))
+        report.duration = time.perf_counter() - start
+        return report
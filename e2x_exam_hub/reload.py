@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+from .schema import NbGrader, ServerConfig, StudentCourse, UserDiff
+from .schema.nbgrader import CourseKey
+from .schema.shard import ShardSpec
+from .schema.utils import Fingerprint, file_fingerprint
+
+
+class ConfigReloader:
+    """
+    Loads a ServerConfig and reloads it when its source files change.
+
+    Every load produces a new ServerConfig snapshot that is never modified afterwards.
+    Readers keep a consistent view by holding on to the snapshot they got, so no locking is
+    needed on the read path. On reload only the course YAML/CSV pairs whose fingerprint
+    changed are parsed again, all other courses are taken over from the previous snapshot.
+
+    Attributes:
+        file_path (str): The path of the server config file.
+        max_workers (int): The number of threads used to load the course files.
+        use_hash (bool): Whether changes are detected by content hash instead of mtime and size.
+        cache_dir (Optional[str]): The directory for the compiled config snapshot.
+        shard (Optional[ShardSpec]): The shard whose courses and course members are loaded,
+            None to load everything.
+        lazy (bool): Whether the courses are loaded on first use, see NbGrader.from_dict.
+            Lazy snapshots are always reloaded completely, since they hold no loaded courses
+            to take over.
+        course_cache_size (int): The number of courses kept loaded in lazy mode.
+        server_config (Optional[ServerConfig]): The current snapshot, None until the config
+            is loaded.
+        reload_count (int): The number of reloads that produced a new snapshot.
+        last_reload_duration (Optional[float]): The duration of the last reload in seconds.
+        last_user_diff (Optional[UserDiff]): The users added and removed by the last reload.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        max_workers: int = 1,
+        use_hash: bool = False,
+        cache_dir: Optional[str] = None,
+        load: bool = True,
+        shard: Optional[ShardSpec] = None,
+        lazy: bool = False,
+        course_cache_size: int = 64,
+    ):
+        self.file_path = file_path
+        self.max_workers = max_workers
+        self.use_hash = use_hash
+        self.cache_dir = cache_dir
+        self.shard = shard
+        self.lazy = lazy
+        self.course_cache_size = course_cache_size
+        self.reload_count = 0
+        self.last_reload_duration: Optional[float] = None
+        self.last_user_diff: Optional[UserDiff] = None
+        self._lock = threading.Lock()
+        self._config_fingerprint: Fingerprint = None
+        self._course_fingerprints: Dict[CourseKey, Tuple[Fingerprint, Fingerprint]] = (
+            dict()
+        )
+        self.server_config: Optional[ServerConfig] = None
+        if load:
+            self.load()
+
+    def load(self) -> ServerConfig:
+        """
+        Load the config unless it is already loaded.
+
+        Returns:
+            ServerConfig: The current snapshot.
+        """
+        with self._lock:
+            if self.server_config is None:
+                self.server_config = self._load()
+            return self.server_config
+
+    def _get_base_path(self, server_config: ServerConfig) -> str:
+        return server_config.nbgrader.get_course_base_path(server_config.config_root)
+
+    def _fingerprint_course(
+        self, base_path: str, key: CourseKey
+    ) -> Tuple[Fingerprint, Fingerprint]:
+        config_file, user_file = StudentCourse.get_course_files(base_path, *key)
+        return (
+            file_fingerprint(config_file, self.use_hash),
+            file_fingerprint(user_file, self.use_hash),
+        )
+
+    def _load(
+        self, loaded_courses: Optional[Dict[CourseKey, StudentCourse]] = None
+    ) -> ServerConfig:
+        loaded_courses = loaded_courses or dict()
+        # The fingerprints are taken before the files are parsed, so a file changing during
+        # the load is parsed again on the next reload instead of being recorded as loaded
+        config_fingerprint = file_fingerprint(self.file_path, self.use_hash)
+        with open(self.file_path, "r") as file:
+            nbgrader_dict = yaml.safe_load(file)["nbgrader"]
+        base_path = os.path.join(
+            os.path.dirname(self.file_path), nbgrader_dict["exam_course_dir"]
+        )
+        course_fingerprints = {
+            key: self._course_fingerprints[key]
+            if key in loaded_courses
+            else self._fingerprint_course(base_path, key)
+            for key in NbGrader.get_course_keys(nbgrader_dict, self.shard)
+        }
+        server_config = ServerConfig.from_yaml_file(
+            self.file_path,
+            max_workers=self.max_workers,
+            loaded_courses=loaded_courses,
+            cache_dir=self.cache_dir,
+            shard=self.shard,
+            lazy=self.lazy,
+            course_cache_size=self.course_cache_size,
+        )
+        self._config_fingerprint = config_fingerprint
+        self._course_fingerprints = course_fingerprints
+        return server_config
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Reload the config if any of its source files changed.
+
+        Args:
+            force (bool): Whether to reload all files even if they did not change.
+
+        Returns:
+            bool: True if a new snapshot was swapped in, False if nothing changed.
+        """
+        if self.server_config is None:
+            self.load()
+            return True
+        with self._lock:
+            start = time.perf_counter()
+            current = self.server_config
+            unchanged_courses = dict()
+            if not force:
+                unchanged_count = 0
+                base_path = self._get_base_path(current)
+                for view in current.nbgrader.course_views:
+                    key = view.course_key
+                    fingerprint = self._fingerprint_course(base_path, key)
+                    if fingerprint == self._course_fingerprints.get(key):
+                        unchanged_count += 1
+                        if view.is_loaded:
+                            unchanged_courses[key] = view.course
+                config_fingerprint = file_fingerprint(self.file_path, self.use_hash)
+                if (
+                    config_fingerprint == self._config_fingerprint
+                    and unchanged_count == len(current.nbgrader.course_views)
+                ):
+                    return False
+            server_config = self._load(unchanged_courses)
+            if unchanged_courses and self._get_base_path(
+                server_config
+            ) != self._get_base_path(current):
+                # The course directory moved, none of the old courses can be reused
+                server_config = self._load()
+            self.server_config = server_config
+            self.last_user_diff = server_config.nbgrader.diff_users(current.nbgrader)
+            self.reload_count += 1
+            self.last_reload_duration = time.perf_counter() - start
+            return True
@@ -1,5 +1,19 @@
 from .base import BaseCourse
-from .nbgrader import NbGrader, StudentCourse
+from .course import CourseView
+from .nbgrader import CourseLoadError, NbGrader, StudentCourse, UserDiff
+from .roster import RosterError, RosterReport, RosterSource, register_roster_format
 from .server import ServerConfig
 
-__all__ = ["ServerConfig", "NbGrader", "StudentCourse", "BaseCourse"]
+__all__ = [
+    "ServerConfig",
+    "NbGrader",
+    "StudentCourse",
+    "BaseCourse",
+    "CourseLoadError",
+    "UserDiff",
+    "CourseView",
+    "RosterSource",
+    "RosterReport",
+    "RosterError",
+    "register_roster_format",
+]
@@ -1,7 +1,9 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from pydantic import BaseModel, Field
 
+from .. import metrics
+
 
 class ModelWithCommands(BaseModel):
     commands: Dict[str, List[str]] = Field(
@@ -11,10 +13,11 @@ class ModelWithCommands(BaseModel):
 
     @property
     def all_commands(self) -> List[str]:
-        commands = []
-        for section, command_list in self.commands.items():
-            commands.extend([command for command in command_list])
-        return commands
+        with metrics.timer("commands_seconds"):
+            commands = []
+            for section, command_list in self.commands.items():
+                commands.extend([command for command in command_list])
+            return commands
 
 
 class Image(BaseModel):
@@ -79,4 +82,12 @@ class BaseCourse(BaseModel):
 
     @property
     def course_id(self) -> str:
-        return f"{self.name}-{self.semester_id}"
+        return self.make_course_id(self.name, self.semester_id)
+
+    @staticmethod
+    def make_course_id(name: str, semester_id: str) -> str:
+        return f"{name}-{semester_id}"
+
+    @property
+    def course_key(self) -> Tuple[str, str, str]:
+        return (self.name, self.semester_id, self.exam_period)
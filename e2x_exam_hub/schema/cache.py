@@ -0,0 +1,118 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded least-recently-used cache that keeps hit and miss counts.
+
+    The cache only holds derived data. It is therefore pickled as an empty cache and two
+    caches compare equal if they have the same size limit, so models holding a cache keep
+    their value semantics.
+
+    Attributes:
+        maxsize (int): The maximum number of entries.
+        hits (int): The number of lookups that found an entry.
+        misses (int): The number of lookups that did not find an entry.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up an entry and mark it as recently used.
+
+        Args:
+            key (Hashable): The key of the entry.
+
+        Returns:
+            Optional[Any]: The cached value, or None if there is no entry for the key.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Add an entry and evict the least recently used entries above the size limit.
+
+        Args:
+            key (Hashable): The key of the entry.
+            value (Any): The value to cache.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove the entries whose key matches a predicate.
+
+        Args:
+            predicate (Callable[[Hashable], bool]): Returns True for the keys to remove.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the hit and miss counts.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """
+        The usage statistics of the cache.
+
+        Returns:
+            Dict[str, int]: The hits, misses, current size and maximum size of the cache.
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            size=len(self._data),
+            maxsize=self.maxsize,
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # A membership test is not a lookup, so neither the order nor the counts change
+        return key in self._data
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, LRUCache):
+            return NotImplemented
+        return self.maxsize == other.maxsize
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return (self.__class__, (self.maxsize,))
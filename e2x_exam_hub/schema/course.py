@@ -1,18 +1,24 @@
 import os
-from typing import Dict, List, Optional, Union
+import time
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Union
 
 import yaml
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
 from .base import BaseCourse, Image, ModelWithCommands, Resources, Volume
 from .exchange import ExchangeConfig
-from .utils import load_user_list
+from .roster import (
+    RosterReport,
+    RosterSource,
+    find_roster_file,
+    get_roster_candidates,
+)
 
 
 class StudentCourse(BaseCourse, ModelWithCommands):
-    course_members: List[str] = Field(
-        list(),
-        description="List of course members",
+    course_members: Tuple[str, ...] = Field(
+        tuple(),
+        description="Course members in the order of the roster",
     )
     exchange: ExchangeConfig = Field(
         ExchangeConfig(),
@@ -26,29 +32,188 @@ class StudentCourse(BaseCourse, ModelWithCommands):
         None,
         description="Resource settings",
     )
+    roster: RosterSource = Field(
+        RosterSource(),
+        description="How the roster file of the course is read",
+    )
+
+    _roster_report: Optional[RosterReport] = PrivateAttr(None)
+
+    @property
+    def member_set(self) -> FrozenSet[str]:
+        """
+        The course members as a set. The members are only stored once, as course_members, so
+        the set is built on every access. Use the user index of NbGrader to look up the
+        courses of a user.
+
+        Returns:
+            FrozenSet[str]: The usernames of all course members.
+        """
+        return frozenset(self.course_members)
+
+    def is_member(self, username: str) -> bool:
+        """
+        Check whether a user is a member of the course. The check scans the roster.
+
+        Args:
+            username (str): The username to check.
+
+        Returns:
+            bool: True if the user is a course member, False otherwise.
+        """
+        return username in self.course_members
+
+    @property
+    def roster_report(self) -> Optional[RosterReport]:
+        """
+        The report of reading the roster file of the course.
+
+        Returns:
+            Optional[RosterReport]: The report, None if the course was not loaded from files.
+        """
+        return self._roster_report
+
+    @staticmethod
+    def get_course_files(
+        base_path: str, course_name: str, semester_id: str, exam_period: str
+    ) -> Tuple[str, str]:
+        """
+        Get the paths of the files a course is loaded from. The roster file is the first
+        file named after the course with the extension of a registered roster format, e.g.
+        .csv, .tsv, .txt or the same with .gz. If there is none, the .csv file is returned.
+
+        Args:
+            base_path (str): The directory containing the course directories.
+            course_name (str): The name of the course.
+            semester_id (str): The semester of the course.
+            exam_period (str): The exam period of the course.
+
+        Returns:
+            Tuple[str, str]: The path of the course config file and of the roster file.
+        """
+        prefix = StudentCourse._get_file_prefix(
+            base_path, course_name, semester_id, exam_period
+        )
+        return f"{prefix}.yaml", find_roster_file(prefix)
+
+    @staticmethod
+    def get_source_files(
+        base_path: str, course_name: str, semester_id: str, exam_period: str
+    ) -> List[str]:
+        """
+        Get the paths of all files a course may be loaded from. Besides the course config
+        file these are all paths the roster file is looked up at, including the ones that do
+        not exist, so that adding a roster file with another extension can be detected.
+
+        Args:
+            base_path (str): The directory containing the course directories.
+            course_name (str): The name of the course.
+            semester_id (str): The semester of the course.
+            exam_period (str): The exam period of the course.
+
+        Returns:
+            List[str]: The path of the course config file and the candidate roster files.
+        """
+        prefix = StudentCourse._get_file_prefix(
+            base_path, course_name, semester_id, exam_period
+        )
+        return [f"{prefix}.yaml"] + get_roster_candidates(prefix)
+
+    @staticmethod
+    def _get_file_prefix(
+        base_path: str, course_name: str, semester_id: str, exam_period: str
+    ) -> str:
+        return os.path.join(
+            base_path, course_name, f"{course_name}.{semester_id}.{exam_period}"
+        )
 
     @classmethod
     def from_yaml_file(
-        cls, base_path: str, course_name: str, semester_id: str, exam_period: str
+        cls,
+        base_path: str,
+        course_name: str,
+        semester_id: str,
+        exam_period: str,
+        timings: Optional[Dict[str, float]] = None,
+        member_filter: Optional[Callable[[str], bool]] = None,
     ) -> "StudentCourse":
-        course_path = os.path.join(base_path, course_name)
-        config_file = os.path.join(
-            course_path,
-            f"{course_name}.{semester_id}.{exam_period}.yaml",
+        """
+        Load a course from its config file and roster file.
+
+        Args:
+            base_path (str): The directory containing the course directories.
+            course_name (str): The name of the course.
+            semester_id (str): The semester of the course.
+            exam_period (str): The exam period of the course.
+            timings (Optional[Dict[str, float]]): If given, the duration of each stage in
+                seconds is stored in it under "yaml", "roster" and "validation".
+            member_filter (Optional[Callable[[str], bool]]): If given, only the course members
+                it returns True for are loaded.
+
+        Returns:
+            StudentCourse: The loaded course.
+        """
+        timings = dict() if timings is None else timings
+        config_file, user_file = cls.get_course_files(
+            base_path, course_name, semester_id, exam_period
         )
-        user_file = os.path.join(
-            course_path,
-            f"{course_name}.{semester_id}.{exam_period}.csv",
+        start = time.perf_counter()
+        with open(config_file, "r") as file:
+            yaml_config = yaml.safe_load(file)
+        now = time.perf_counter()
+        timings["yaml"] = now - start
+        start = now
+
+        roster = RosterSource.model_validate(yaml_config.get("roster", dict()))
+        course_members, roster_report = roster.load(user_file, member_filter)
+        now = time.perf_counter()
+        timings["roster"] = now - start
+        start = now
+
+        course = cls(
+            name=course_name,
+            semester_id=semester_id,
+            exam_period=exam_period,
+            course_members=course_members,
+            **yaml_config,
+        )
+        course._roster_report = roster_report
+        timings["validation"] = time.perf_counter() - start
+        return course
+
+    @classmethod
+    def load_roster(
+        cls,
+        base_path: str,
+        course_name: str,
+        semester_id: str,
+        exam_period: str,
+        member_filter: Optional[Callable[[str], bool]] = None,
+    ) -> Tuple[List[str], RosterReport]:
+        """
+        Load only the members of a course, without validating the rest of its config.
+
+        The config file is read for the roster settings only.
+
+        Args:
+            base_path (str): The directory containing the course directories.
+            course_name (str): The name of the course.
+            semester_id (str): The semester of the course.
+            exam_period (str): The exam period of the course.
+            member_filter (Optional[Callable[[str], bool]]): If given, only the course members
+                it returns True for are loaded.
+
+        Returns:
+            Tuple[List[str], RosterReport]: The course members and the report of reading the
+                roster file.
+        """
+        config_file, user_file = cls.get_course_files(
+            base_path, course_name, semester_id, exam_period
         )
         with open(config_file, "r") as file:
             yaml_config = yaml.safe_load(file)
-            return cls(
-                name=course_name,
-                semester_id=semester_id,
-                exam_period=exam_period,
-                course_members=load_user_list(user_file),
-                **yaml_config,
-            )
+        roster = RosterSource.model_validate(yaml_config.get("roster", dict()))
+        return roster.load(user_file, member_filter)
 
     def get_exchange_volume_mounts(
         self, volume: Volume, username: str
@@ -57,3 +222,102 @@ class StudentCourse(BaseCourse, ModelWithCommands):
 
     def get_exchange_commands(self, nbgrader_config_file: str) -> List[str]:
         return self.exchange.get_commands(nbgrader_config_file)
+
+
+class CourseView:
+    """
+    A lightweight, read-only view of a student course for the spawn path.
+
+    The identifiers of the course are computed once and the view shares the members of the
+    course instead of copying them. A view can also be created from the roster alone, in which
+    case the full course model is only loaded when the course attribute is first accessed.
+
+    Attributes:
+        name (str): The name of the course.
+        semester_id (str): The semester of the course.
+        exam_period (str): The exam period of the course.
+        course_id (str): The course ID, as in StudentCourse.course_id.
+        course_key (Tuple[str, str, str]): The (name, semester_id, exam_period) of the course.
+        members (Tuple[str, ...]): The usernames of all course members.
+        roster_report (Optional[RosterReport]): The report of reading the roster file.
+        course (StudentCourse): The full course model.
+    """
+
+    __slots__ = (
+        "name",
+        "semester_id",
+        "exam_period",
+        "course_id",
+        "course_key",
+        "members",
+        "roster_report",
+        "_course",
+        "_loader",
+    )
+
+    def __init__(self, course: StudentCourse):
+        self.name = course.name
+        self.semester_id = course.semester_id
+        self.exam_period = course.exam_period
+        self.course_id = course.course_id
+        self.course_key = course.course_key
+        self.members = course.course_members
+        self.roster_report = course.roster_report
+        self._course = course
+        self._loader = None
+
+    @classmethod
+    def from_roster(
+        cls,
+        course_key: Tuple[str, str, str],
+        members: Tuple[str, ...],
+        loader: Callable[[Tuple[str, str, str]], StudentCourse],
+        roster_report: Optional[RosterReport] = None,
+    ) -> "CourseView":
+        """
+        Create a view of a course whose full model is not loaded yet.
+
+        Args:
+            course_key (Tuple[str, str, str]): The (name, semester_id, exam_period) of the
+                course.
+            members (Tuple[str, ...]): The usernames of all course members.
+            loader (Callable[[Tuple[str, str, str]], StudentCourse]): Returns the full course
+                model for the course key. It is called on every access of the course
+                attribute and is expected to cache the model.
+            roster_report (Optional[RosterReport]): The report of reading the roster file.
+
+        Returns:
+            CourseView: The view.
+        """
+        view = cls.__new__(cls)
+        view.name, view.semester_id, view.exam_period = course_key
+        view.course_id = BaseCourse.make_course_id(view.name, view.semester_id)
+        view.course_key = course_key
+        view.members = members
+        view.roster_report = roster_report
+        view._course = None
+        view._loader = loader
+        return view
+
+    @property
+    def course(self) -> StudentCourse:
+        if self._course is not None:
+            return self._course
+        return self._loader(self.course_key)
+
+    @property
+    def is_loaded(self) -> bool:
+        """
+        Whether the view holds the full course model, False if it is loaded on demand.
+        """
+        return self._course is not None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CourseView):
+            return NotImplemented
+        return self.course_key == other.course_key and self.members == other.members
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CourseView({self.course_id!r}, exam_period={self.exam_period!r})"
@@ -40,6 +40,23 @@ class ExchangeConfig(BaseModel):
             path = os.path.join(path, username)
         return path
 
+    def get_subPath(
+        self, volume: Volume, course: BaseCourse, username: str, step: str
+    ) -> str:
+        """
+        Get the sub-path of an exchange directory of a user on the exchange volume.
+
+        Args:
+            volume (Volume): The exchange volume.
+            course (BaseCourse): The course.
+            username (str): The user. Not part of the path unless the step is personalized.
+            step (str): One of "inbound", "outbound" and "feedback".
+
+        Returns:
+            str: The sub-path.
+        """
+        return self._get_subPath(volume, course, username, step)
+
     def _get_mountPath(self, course: BaseCourse, username: str, step) -> str:
         directory = self._get_step_name(step)
         path = os.path.join(
@@ -74,15 +91,15 @@ class ExchangeConfig(BaseModel):
         )
         return mounts
 
+    def get_config_lines(self) -> List[str]:
+        return [
+            f"c.Exchange.personalized_feedback = {self.personalized_feedback}",
+            f"c.Exchange.personalized_inbound = {self.personalized_inbound}",
+            f"c.Exchange.personalized_outbound = {self.personalized_outbound}",
+        ]
+
     def get_commands(self, nbgrader_config_file: str) -> List[str]:
         return [
-            r"echo 'c.Exchange.personalized_feedback = {}' >> {}".format(
-                self.personalized_feedback, nbgrader_config_file
-            ),
-            r"echo 'c.Exchange.personalized_inbound = {}' >> {}".format(
-                self.personalized_inbound, nbgrader_config_file
-            ),
-            r"echo 'c.Exchange.personalized_outbound = {}' >> {}".format(
-                self.personalized_outbound, nbgrader_config_file
-            ),
+            r"echo '{}' >> {}".format(line, nbgrader_config_file)
+            for line in self.get_config_lines()
         ]
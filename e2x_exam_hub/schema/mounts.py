@@ -1,10 +1,18 @@
 import os
-from typing import Dict, List, Optional, Union
+from typing import ClassVar, Collection, Dict, Iterable, List, Optional, Tuple, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
+from .. import metrics
 from .base import BaseCourse, Volume
+from .cache import LRUCache
 from .course import StudentCourse
+from .templates import (
+    USERNAME_PLACEHOLDER,
+    MountTemplate,
+    compile_mount_templates,
+    render_mount_templates,
+)
 
 
 class Mount(BaseModel):
@@ -62,9 +70,12 @@ class Mounts(BaseModel):
 
         get_mounts(course: BaseCourse, username: str) -> List[Mount]:
             Returns a list of all Mount objects (temp, shared, home, exchange) specific to a course
-            and user.
+            and user. The result is rendered from a precompiled per course template and
+            cached per course and user.
     """
 
+    mount_cache_size: ClassVar[int] = 4096
+
     exchange: Volume = Field(
         ...,
         description="Volume for the exchange directory",
@@ -82,6 +93,11 @@ class Mounts(BaseModel):
         description="Volume for the home directory",
     )
 
+    _mount_cache: LRUCache = PrivateAttr(
+        default_factory=lambda: LRUCache(Mounts.mount_cache_size)
+    )
+    _templates: Dict[Tuple[str, str], Tuple[MountTemplate, ...]] = PrivateAttr(dict())
+
     def _get_temp_mount(self, course: BaseCourse, username: str) -> Mount:
         """
         Creates a temporary mount for a given course and user.
@@ -156,6 +172,20 @@ class Mounts(BaseModel):
             mountPath="/home/jovyan",
         )
 
+    def get_home_mount(self, course: BaseCourse, username: str) -> Mount:
+        """
+        Get the mount of the home directory of a user in a course, e.g. to locate the
+        directory on the volume outside of a server.
+
+        Args:
+            course (BaseCourse): The course.
+            username (str): The username of the student.
+
+        Returns:
+            Mount: The home mount.
+        """
+        return self._get_home_mount(course, username)
+
     def _get_exchange_mounts(self, course: StudentCourse, username: str) -> List[Mount]:
         """
         Retrieve the exchange volume mounts for a given course and user.
@@ -176,7 +206,9 @@ class Mounts(BaseModel):
         Retrieve a list of mounts for a given course and user.
 
         This method generates a list of mounts by combining temporary, shared, home,
-        and exchange mounts for the specified course and username.
+        and exchange mounts for the specified course and username. The mounts are cached per
+        course and user. A new Mounts object, e.g. after a config reload, starts with an
+        empty cache.
 
         Args:
             course (StudentCourse): The course for which mounts are being retrieved.
@@ -184,8 +216,51 @@ class Mounts(BaseModel):
 
         Returns:
             List[Mount]: A list of Mount objects representing the various mounts for the course
-            and user.
+            and user. The list and its dictionaries are copies that may be modified.
+        """
+        with metrics.timer("mounts_seconds"):
+            key = (course.course_id, course.exam_period, username)
+            mounts = self._mount_cache.get(key)
+            if mounts is None:
+                metrics.increment("mount_cache_misses_total")
+                mounts = render_mount_templates(self.get_templates(course), username)
+                self._mount_cache.put(key, mounts)
+            else:
+                metrics.increment("mount_cache_hits_total")
+            return [dict(mount) for mount in mounts]
+
+    def get_templates(self, course: StudentCourse) -> Tuple[MountTemplate, ...]:
+        """
+        Get the compiled mount templates of a course, compiling them on first use.
+
+        Args:
+            course (StudentCourse): The course for which to get the templates.
+
+        Returns:
+            Tuple[MountTemplate, ...]: The mount templates of the course.
         """
+        key = (course.course_id, course.exam_period)
+        templates = self._templates.get(key)
+        if templates is None:
+            templates = compile_mount_templates(
+                self._build_mounts(course, USERNAME_PLACEHOLDER)
+            )
+            self._templates[key] = templates
+        return templates
+
+    def compile_templates(self, courses: Iterable[StudentCourse]) -> None:
+        """
+        Compile the mount templates of the given courses ahead of time.
+
+        Args:
+            courses (Iterable[StudentCourse]): The courses to compile the templates for.
+        """
+        for course in courses:
+            self.get_templates(course)
+
+    def _build_mounts(
+        self, course: StudentCourse, username: str
+    ) -> List[Dict[str, Union[str, bool]]]:
         mounts = list()
 
         mounts.append(self._get_temp_mount(course, username).model_dump())
@@ -196,3 +271,34 @@ class Mounts(BaseModel):
         mounts.extend(self._get_exchange_mounts(course, username))
 
         return mounts
+
+    @property
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        The hit and miss statistics of the mount cache.
+
+        Returns:
+            Dict[str, int]: The hits, misses, current size and maximum size of the cache.
+        """
+        return self._mount_cache.stats
+
+    def evict_courses(self, courses: Collection[Tuple[str, str]]) -> int:
+        """
+        Remove the compiled templates and cached mounts of courses.
+
+        Args:
+            courses (Collection[Tuple[str, str]]): The (course_id, exam_period) of each
+                course.
+
+        Returns:
+            int: The number of removed mount cache entries.
+        """
+        for key in courses:
+            self._templates.pop(key, None)
+        return self._mount_cache.discard_where(lambda key: key[:2] in courses)
+
+    def clear_cache(self) -> None:
+        """
+        Remove all cached mounts.
+        """
+        self._mount_cache.clear()
@@ -1,9 +1,182 @@
 import os
-from typing import Dict, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 
-from .course import StudentCourse
+from .. import metrics
+from .cache import LRUCache
+from .course import CourseView, StudentCourse
+from .roster import RosterReport
+from .schedule import ExamSchedule, Window
+from .shard import ShardSpec
+
+CourseKey = Tuple[str, str, str]
+T = TypeVar("T")
+
+
+class UserDiff(NamedTuple):
+    """
+    The users added and removed between two versions of the config.
+
+    Attributes:
+        added (FrozenSet[str]): Users that are only members of a course in the new version.
+        removed (FrozenSet[str]): Users that are only members of a course in the old version.
+    """
+
+    added: FrozenSet[str]
+    removed: FrozenSet[str]
+
+
+class ActiveCourses(NamedTuple):
+    """
+    The courses that are active between two changes of the exam schedule.
+
+    Attributes:
+        segment (int): The index of the segment of the schedule.
+        start (Optional[float]): The start of the segment, None if it is open.
+        end (Optional[float]): The end of the segment, None if it is open.
+        course_keys (FrozenSet[CourseKey]): The keys of the active courses.
+        users (FrozenSet[str]): The members of the active courses.
+    """
+
+    segment: int
+    start: Optional[float]
+    end: Optional[float]
+    course_keys: FrozenSet[CourseKey]
+    users: FrozenSet[str]
+
+    def includes(self, now: float) -> bool:
+        return (self.start is None or self.start <= now) and (
+            self.end is None or now < self.end
+        )
+
+
+class CourseLoadError(Exception):
+    """
+    Raised when one or more student courses could not be loaded.
+
+    Attributes:
+        errors (Dict[CourseKey, Exception]): The error for each course that failed to load, keyed
+            by (course_name, semester_id, exam_period).
+    """
+
+    def __init__(self, errors: Dict[CourseKey, Exception]):
+        self.errors = errors
+        details = "\n".join(
+            f"  {'.'.join(key)}: {type(error).__name__}: {error}"
+            for key, error in errors.items()
+        )
+        super().__init__(f"Failed to load {len(errors)} student course(s):\n{details}")
+
+
+def _load_courses(
+    load: Callable[[CourseKey], T], course_keys: List[CourseKey], max_workers: int
+) -> Dict[CourseKey, T]:
+    results = dict()
+    errors = dict()
+    if max_workers <= 1:
+        for key in course_keys:
+            try:
+                results[key] = load(key)
+            except Exception as error:
+                errors[key] = error
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {key: executor.submit(load, key) for key in course_keys}
+        for key, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                errors[key] = error
+            else:
+                results[key] = future.result()
+    if errors:
+        raise CourseLoadError(errors)
+    return results
+
+
+def load_student_courses(
+    base_path: str,
+    course_keys: List[CourseKey],
+    max_workers: int = 1,
+    loaded_courses: Optional[Dict[CourseKey, StudentCourse]] = None,
+    member_filter: Optional[Callable[[str], bool]] = None,
+) -> List[StudentCourse]:
+    """
+    Load the student courses from their YAML and CSV files.
+
+    With max_workers > 1 the files are read and parsed in a thread pool. All courses are
+    attempted and the errors are collected instead of stopping at the first failure.
+
+    Args:
+        base_path (str): The directory containing the course directories.
+        course_keys (List[CourseKey]): The (course_name, semester_id, exam_period) of each course.
+        max_workers (int): The number of threads used to load the courses. Defaults to 1, which
+            loads the courses one after another.
+        loaded_courses (Optional[Dict[CourseKey, StudentCourse]]): Courses that are already
+            loaded. They are reused instead of being read from disk again.
+        member_filter (Optional[Callable[[str], bool]]): If given, only the course members it
+            returns True for are loaded.
+
+    Returns:
+        List[StudentCourse]: The loaded courses in the order of course_keys.
+
+    Raises:
+        CourseLoadError: If any of the courses could not be loaded.
+    """
+    loaded_courses = loaded_courses or dict()
+    courses = _load_courses(
+        lambda key: StudentCourse.from_yaml_file(
+            base_path, *key, member_filter=member_filter
+        ),
+        [key for key in course_keys if key not in loaded_courses],
+        max_workers,
+    )
+    metrics.increment("courses_loaded_total", len(courses))
+    return [loaded_courses.get(key) or courses[key] for key in course_keys]
+
+
+def load_course_rosters(
+    base_path: str,
+    course_keys: List[CourseKey],
+    max_workers: int = 1,
+    member_filter: Optional[Callable[[str], bool]] = None,
+) -> Dict[CourseKey, Tuple[List[str], RosterReport]]:
+    """
+    Load only the rosters of the student courses, see StudentCourse.load_roster.
+
+    Args:
+        base_path (str): The directory containing the course directories.
+        course_keys (List[CourseKey]): The (course_name, semester_id, exam_period) of each course.
+        max_workers (int): The number of threads used to load the rosters.
+        member_filter (Optional[Callable[[str], bool]]): If given, only the course members it
+            returns True for are loaded.
+
+    Returns:
+        Dict[CourseKey, Tuple[List[str], RosterReport]]: The members and the roster report of
+            each course.
+
+    Raises:
+        CourseLoadError: If any of the rosters could not be loaded.
+    """
+    return _load_courses(
+        lambda key: StudentCourse.load_roster(
+            base_path, *key, member_filter=member_filter
+        ),
+        course_keys,
+        max_workers,
+    )
 
 
 class SemesterConfig(BaseModel):
@@ -15,6 +188,34 @@ class SemesterConfig(BaseModel):
         ...,
         description="Exam period",
     )
+    start: Optional[datetime] = Field(
+        None,
+        description="When the course becomes active. Times without a timezone are local "
+        "times. Defaults to always",
+    )
+    end: Optional[datetime] = Field(
+        None,
+        description="When the course stops being active. Defaults to never",
+    )
+
+    @model_validator(mode="after")
+    def check_window(self) -> "SemesterConfig":
+        # Compare the timestamps, since a local and a timezone-aware time can not be
+        # compared directly
+        start, end = self.window
+        if start is not None and end is not None and end <= start:
+            raise ValueError("end must be after start")
+        return self
+
+    @property
+    def window(self) -> Window:
+        """
+        The start and end of the course as Unix timestamps, None for an open bound.
+        """
+        return (
+            self.start.timestamp() if self.start is not None else None,
+            self.end.timestamp() if self.end is not None else None,
+        )
 
 
 class ActiveCourseConfig(BaseModel):
@@ -45,32 +246,424 @@ class NbGrader(BaseModel):
         description="List of courses",
     )
 
-    @classmethod
-    def from_dict(cls, config_root: str, nbgrader_dict: dict):
+    _course_views: List[CourseView] = PrivateAttr(list())
+    _user_courses: Dict[str, Tuple[CourseView, ...]] = PrivateAttr(dict())
+    _users: FrozenSet[str] = PrivateAttr(frozenset())
+    _course_cache: Optional[LRUCache] = PrivateAttr(None)
+    _course_base_path: Optional[str] = PrivateAttr(None)
+    _member_filter: Optional[Callable[[str], bool]] = PrivateAttr(None)
+    _schedule: Optional[ExamSchedule] = PrivateAttr(None)
+    _active: Optional[ActiveCourses] = PrivateAttr(None)
+
+    def model_post_init(self, __context) -> None:
+        self._course_views = [CourseView(course) for course in self.student_courses]
+        self._build_user_index()
+
+    def _build_user_index(self) -> None:
+        """
+        Build the index mapping each username to the courses the user is a member of.
+        The courses of a user are kept in the order of the course views. Users with the same
+        courses share a single tuple of course views, which keeps the index small for large
+        rosters.
+        """
+        views = self._course_views
+        user_courses = dict()
+        for index, view in enumerate(views):
+            for username in view.members:
+                user_courses.setdefault(username, []).append(index)
+        shared_views = dict()
+        for username, indices in user_courses.items():
+            indices = tuple(indices)
+            user_views = shared_views.get(indices)
+            if user_views is None:
+                user_views = tuple(views[index] for index in indices)
+                shared_views[indices] = user_views
+            user_courses[username] = user_views
+        self._user_courses = user_courses
+        self._users = frozenset(user_courses)
+
+    @property
+    def lazy(self) -> bool:
+        """
+        Whether the student courses are loaded on first use instead of at startup.
+        """
+        return self._course_cache is not None
+
+    @property
+    def course_views(self) -> List[CourseView]:
+        """
+        The views of all active student courses, in both eager and lazy mode. In lazy mode
+        student_courses is empty and the courses are only loaded through the views.
+
+        Returns:
+            List[CourseView]: The course views in the configured order.
+        """
+        return self._course_views
+
+    @property
+    def course_cache_stats(self) -> Optional[Dict[str, int]]:
+        """
+        The usage statistics of the cache of loaded courses, None if not in lazy mode.
+        """
+        return self._course_cache.stats if self._course_cache is not None else None
+
+    def get_cached_course(self, key: CourseKey) -> Optional[StudentCourse]:
+        """
+        Get a course if its model is available without any I/O. Only used in lazy mode, in
+        eager mode every course is available from course_views.
+
+        Args:
+            key (CourseKey): The course_name, semester_id and exam_period of the course.
+
+        Returns:
+            Optional[StudentCourse]: The course, or None if it is not loaded.
+        """
+        return self._course_cache.get(key)
+
+    def _get_course(self, key: CourseKey) -> StudentCourse:
+        course = self._course_cache.get(key)
+        if course is None:
+            # Concurrent misses may load a course twice, the last one is kept. The async
+            # API of ExamHub loads courses through a shared executor call instead
+            with metrics.timer("course_materialize_seconds"):
+                course = StudentCourse.from_yaml_file(
+                    self._course_base_path, *key, member_filter=self._member_filter
+                )
+            metrics.increment("courses_materialized_total")
+            self._course_cache.put(key, course)
+        return course
+
+    def _set_schedule(self, windows: Dict[CourseKey, Window]) -> None:
+        """
+        Build the interval index of the course windows. Without any window every course is
+        always active and no index is built.
+        """
+        course_windows = [
+            windows.get(view.course_key, (None, None)) for view in self._course_views
+        ]
+        if any(start is not None or end is not None for start, end in course_windows):
+            self._schedule = ExamSchedule(course_windows)
+        else:
+            self._schedule = None
+        self._active = None
+
+    @property
+    def scheduled(self) -> bool:
+        """
+        Whether any course has a start or end time.
+        """
+        return self._schedule is not None
+
+    def get_active_courses(
+        self, now: Optional[float] = None
+    ) -> Optional[ActiveCourses]:
+        """
+        Get the courses that are active at a point in time.
+
+        The result is kept until the next start or end of a course, so repeated lookups only
+        compare timestamps. When the active courses change, the courses that are no longer
+        active are removed from the cache of lazily loaded courses.
+
+        Args:
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            Optional[ActiveCourses]: The active courses, None if no course has a start or end
+            time.
+        """
+        schedule = self._schedule
+        if schedule is None:
+            return None
+        now = time.time() if now is None else now
+        active = self._active
+        if active is not None and active.includes(now):
+            return active
+        segment = schedule.get_segment(now)
+        indices = schedule.get_active(segment)
+        views = [
+            view for index, view in enumerate(self._course_views) if index in indices
+        ]
+        active = ActiveCourses(
+            segment,
+            *schedule.get_segment_bounds(segment),
+            course_keys=frozenset(view.course_key for view in views),
+            users=frozenset().union(*(view.members for view in views)),
+        )
+        self._active = active
+        if self._course_cache is not None:
+            self._course_cache.discard_where(lambda key: key not in active.course_keys)
+        return active
+
+    def is_active(self, course_key: CourseKey, now: Optional[float] = None) -> bool:
+        """
+        Check whether a course is active at a point in time.
+
+        Args:
+            course_key (CourseKey): The (course_name, semester_id, exam_period) of the course.
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            bool: True if the course is active, False otherwise.
+        """
+        active = self.get_active_courses(now)
+        return active is None or course_key in active.course_keys
+
+    @property
+    def users(self) -> FrozenSet[str]:
+        """
+        All users that are members of at least one student course, regardless of the start
+        and end times of the courses.
+
+        Returns:
+            FrozenSet[str]: The usernames, each listed once.
+        """
+        return self._users
+
+    def get_active_users(self, now: Optional[float] = None) -> FrozenSet[str]:
+        """
+        The users that are members of at least one active course.
+
+        Args:
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            FrozenSet[str]: The usernames, each listed once.
+        """
+        active = self.get_active_courses(now)
+        return self._users if active is None else active.users
+
+    def diff_users(self, previous: "NbGrader", now: Optional[float] = None) -> UserDiff:
+        """
+        Compare the active users with those of a previous version of the config at the same
+        point in time.
+
+        Args:
+            previous (NbGrader): The previous version of the config.
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            UserDiff: The users added and removed since the previous version.
+        """
+        now = time.time() if now is None else now
+        users = self.get_active_users(now)
+        previous_users = previous.get_active_users(now)
+        return UserDiff(added=users - previous_users, removed=previous_users - users)
+
+    @staticmethod
+    def get_course_keys(
+        nbgrader_dict: dict, shard: Optional[ShardSpec] = None
+    ) -> List[CourseKey]:
+        """
+        Get the keys of all active student courses in the order they are configured.
+
+        Args:
+            nbgrader_dict (dict): The nbgrader section of the server config.
+            shard (Optional[ShardSpec]): If given, only the courses loaded on this shard are
+                returned.
+
+        Returns:
+            List[CourseKey]: The (course_name, semester_id, exam_period) of each course.
+        """
+        course_keys = list(NbGrader.get_course_windows(nbgrader_dict))
+        if shard is not None:
+            course_keys = shard.filter_course_keys(course_keys)
+        return course_keys
+
+    @staticmethod
+    def get_course_windows(nbgrader_dict: dict) -> Dict[CourseKey, Window]:
+        """
+        Get the start and end time of all active student courses in the order they are
+        configured.
+
+        Args:
+            nbgrader_dict (dict): The nbgrader section of the server config.
+
+        Returns:
+            Dict[CourseKey, Window]: The start and end of each course as Unix timestamps,
+            None for an open bound.
+        """
         active_student_courses = ActiveStudentCourses(
             courses=nbgrader_dict.get("active_student_courses", dict())
         )
+        return {
+            (
+                course_name,
+                semester_config.semester,
+                semester_config.exam_period,
+            ): semester_config.window
+            for course_name, active_course_config in active_student_courses.courses.items()
+            for semester_config in active_course_config.semesters
+        }
+
+    @classmethod
+    def get_source_files(
+        cls,
+        config_root: str,
+        nbgrader_dict: dict,
+        shard: Optional[ShardSpec] = None,
+    ) -> List[str]:
+        """
+        Get the paths of the course config and user list files of all active courses. All
+        paths a user list file is looked up at are included, whether it exists or not.
+
+        Args:
+            config_root (str): The root path of the configuration files.
+            nbgrader_dict (dict): The nbgrader section of the server config.
+            shard (Optional[ShardSpec]): If given, only the files loaded on this shard are
+                returned.
+
+        Returns:
+            List[str]: The paths of the course files.
+        """
+        base_path = os.path.join(config_root, nbgrader_dict["exam_course_dir"])
+        source_files = []
+        for key in cls.get_course_keys(nbgrader_dict, shard):
+            source_files.extend(StudentCourse.get_source_files(base_path, *key))
+        return source_files
+
+    @classmethod
+    def from_dict(
+        cls,
+        config_root: str,
+        nbgrader_dict: dict,
+        max_workers: int = 1,
+        loaded_courses: Optional[Dict[CourseKey, StudentCourse]] = None,
+        shard: Optional[ShardSpec] = None,
+        lazy: bool = False,
+        course_cache_size: int = 64,
+    ):
+        """
+        Load the nbgrader section of the server config and its student courses.
+
+        Courses with a start or end time are only returned by the user lookups while they
+        are active, see get_active_courses.
+
+        In lazy mode only the rosters are read at startup to build the user index. The full
+        course models are loaded when get_user_courses first needs them and are kept in an
+        LRU cache of course_cache_size courses. student_courses stays empty, use
+        course_views to iterate over the courses.
+
+        Args:
+            config_root (str): The root path of the configuration files.
+            nbgrader_dict (dict): The nbgrader section of the server config.
+            max_workers (int): The number of threads used to load the course files.
+            loaded_courses (Optional[Dict[CourseKey, StudentCourse]]): Courses that are
+                already loaded. Ignored in lazy mode.
+            shard (Optional[ShardSpec]): If given, only the courses and course members of
+                this shard are loaded.
+            lazy (bool): Whether to load the courses on first use.
+            course_cache_size (int): The number of courses kept loaded in lazy mode.
+
+        Returns:
+            NbGrader: The loaded nbgrader config.
+        """
         exam_course_dir = nbgrader_dict["exam_course_dir"]
-        student_courses = []
-        for course_name, active_course_config in active_student_courses.courses.items():
-            for semester_config in active_course_config.semesters:
-                student_courses.append(
-                    StudentCourse.from_yaml_file(
-                        os.path.join(config_root, exam_course_dir),
-                        course_name,
-                        semester_config.semester,
-                        semester_config.exam_period,
-                    )
+        base_path = os.path.join(config_root, exam_course_dir)
+        course_keys = cls.get_course_keys(nbgrader_dict, shard)
+        member_filter = shard.member_filter if shard is not None else None
+        if not lazy:
+            with metrics.timer("courses_load_seconds"):
+                student_courses = load_student_courses(
+                    base_path,
+                    course_keys,
+                    max_workers=max_workers,
+                    loaded_courses=loaded_courses,
+                    member_filter=member_filter,
                 )
-        return cls(
-            exam_course_dir=exam_course_dir,
-            student_courses=student_courses,
-            commands=nbgrader_dict.get("commands", dict()),
-        )
+            nbgrader = cls(
+                exam_course_dir=exam_course_dir,
+                student_courses=student_courses,
+                commands=nbgrader_dict.get("commands", dict()),
+            )
+        else:
+            with metrics.timer("courses_load_seconds"):
+                rosters = load_course_rosters(
+                    base_path,
+                    course_keys,
+                    max_workers=max_workers,
+                    member_filter=member_filter,
+                )
+            nbgrader = cls(
+                exam_course_dir=exam_course_dir,
+                commands=nbgrader_dict.get("commands", dict()),
+            )
+            nbgrader._course_cache = LRUCache(course_cache_size)
+            nbgrader._course_base_path = base_path
+            nbgrader._member_filter = member_filter
+            nbgrader._course_views = [
+                CourseView.from_roster(
+                    key,
+                    tuple(rosters[key][0]),
+                    nbgrader._get_course,
+                    rosters[key][1],
+                )
+                for key in course_keys
+            ]
+            nbgrader._build_user_index()
+        nbgrader._set_schedule(cls.get_course_windows(nbgrader_dict))
+        return nbgrader
 
-    def get_user_courses(self, username: str) -> List[StudentCourse]:
-        return [
-            course
-            for course in self.student_courses
-            if username in course.course_members
-        ]
+    def get_course_base_path(self, config_root: str) -> str:
+        return os.path.join(config_root, self.exam_course_dir)
+
+    def get_user_course_views(self, username: str) -> Tuple[CourseView, ...]:
+        """
+        Get lightweight views of the courses of a user without copying anything. The
+        courses are returned regardless of their start and end times.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            Tuple[CourseView, ...]: The course views in the order of student_courses.
+        """
+        return self._user_courses.get(username, ())
+
+    def get_active_user_course_views(
+        self, username: str, now: Optional[float] = None
+    ) -> Tuple[CourseView, ...]:
+        """
+        Get the views of the courses of a user that are active at a point in time.
+
+        Args:
+            username (str): The username of the user.
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            Tuple[CourseView, ...]: The course views in the order of student_courses.
+        """
+        views = self._user_courses.get(username, ())
+        active = self.get_active_courses(now)
+        if active is None:
+            return views
+        if username not in active.users:
+            return ()
+        return tuple(view for view in views if view.course_key in active.course_keys)
+
+    def get_user_courses(
+        self, username: str, now: Optional[float] = None
+    ) -> List[StudentCourse]:
+        """
+        Get the courses of a user that are active at a point in time.
+
+        Args:
+            username (str): The username of the user.
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            List[StudentCourse]: The courses in the order of student_courses.
+        """
+        with metrics.timer("user_courses_lookup_seconds"):
+            courses = [
+                view.course for view in self.get_active_user_course_views(username, now)
+            ]
+        metrics.increment("user_courses_lookups_total")
+        if not courses:
+            metrics.increment("user_courses_lookup_misses_total")
+        return courses
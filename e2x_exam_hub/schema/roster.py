@@ -0,0 +1,378 @@
+import csv
+import gzip
+import io
+import os
+import sys
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+
+from pydantic import BaseModel, Field, field_validator
+
+from .. import metrics
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# The number of malformed rows listed in a roster report, the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+class RosterRow(NamedTuple):
+    """
+    A row read from a roster file.
+
+    Attributes:
+        line (int): The line number of the row in the file.
+        value (Optional[str]): The raw username, None if the row is malformed.
+        error (Optional[str]): Why the row is malformed, None otherwise.
+    """
+
+    line: int
+    value: Optional[str]
+    error: Optional[str]
+
+
+RosterReader = Callable[[TextIO, "RosterSource"], Iterator[RosterRow]]
+
+
+class RosterFormat(NamedTuple):
+    """
+    A registered roster file format.
+
+    Attributes:
+        reader (RosterReader): Streams the rows of an open roster file.
+        extensions (Tuple[str, ...]): The file extensions of the format, without compression.
+    """
+
+    reader: RosterReader
+    extensions: Tuple[str, ...]
+
+
+ROSTER_FORMATS: Dict[str, RosterFormat] = dict()
+
+
+def register_roster_format(
+    name: str, reader: RosterReader, extensions: Tuple[str, ...] = ()
+) -> None:
+    """
+    Register a roster file format.
+
+    Roster files with one of the extensions are found next to the course config and read with
+    the reader, also when they are gzip compressed.
+
+    Args:
+        name (str): The name of the format, as used in the roster settings of a course.
+        reader (RosterReader): Streams the rows of an open roster file.
+        extensions (Tuple[str, ...]): The file extensions of the format, e.g. (".csv",).
+    """
+    ROSTER_FORMATS[name] = RosterFormat(reader=reader, extensions=extensions)
+
+
+class RosterError(ValueError):
+    """
+    Raised when a roster file can not be read, e.g. because the username column is missing.
+    """
+
+
+class RosterReport(BaseModel):
+    """
+    The result of reading a roster file.
+
+    Attributes:
+        file (str): The path of the roster file.
+        format (str): The format the file was read as.
+        missing (bool): Whether the file does not exist.
+        rows (int): The number of rows read, without the header and empty lines.
+        members (int): The number of distinct usernames.
+        duplicates (int): The number of rows repeating a username.
+        malformed (int): The number of rows that were skipped because they are malformed.
+        excluded (int): The number of rows excluded by a member filter, e.g. users served by
+            another shard.
+        errors (List[str]): The first malformed rows with their line number and the problem.
+    """
+
+    file: str = Field(..., description="Path of the roster file")
+    format: str = Field(..., description="Format the file was read as")
+    missing: bool = Field(False, description="Whether the file does not exist")
+    rows: int = Field(0, description="Number of rows read")
+    members: int = Field(0, description="Number of distinct usernames")
+    duplicates: int = Field(0, description="Number of rows repeating a username")
+    malformed: int = Field(0, description="Number of skipped malformed rows")
+    excluded: int = Field(0, description="Number of rows excluded by a member filter")
+    errors: List[str] = Field(list(), description="The first malformed rows")
+
+    @property
+    def ok(self) -> bool:
+        """
+        Whether the roster exists and has no malformed rows.
+        """
+        return not self.missing and self.malformed == 0
+
+
+class RosterSource(BaseModel):
+    """
+    How the roster file of a course is read. Set in the roster section of the course config.
+    """
+
+    format: str = Field(
+        "auto",
+        description="Format of the roster file. 'auto' detects it from the file extension",
+    )
+    column: str = Field(
+        "Username",
+        description="Column containing the usernames in csv and tsv files",
+    )
+    delimiter: Optional[str] = Field(
+        None,
+        description="Field delimiter. Defaults to ',' for csv and a tab for tsv files",
+        min_length=1,
+        max_length=1,
+    )
+    encoding: str = Field("utf-8-sig", description="Encoding of the roster file")
+    strip: bool = Field(True, description="Strip whitespace around usernames")
+    lowercase: bool = Field(False, description="Convert usernames to lower case")
+    strict: bool = Field(
+        False,
+        description="Fail to load the course if the roster has malformed rows",
+    )
+
+    @field_validator("format")
+    @classmethod
+    def check_format(cls, value: str) -> str:
+        if value != "auto" and value not in ROSTER_FORMATS:
+            raise ValueError(
+                f"Unknown roster format {value!r}, "
+                f"expected one of {['auto'] + list(ROSTER_FORMATS)}"
+            )
+        return value
+
+    def get_format(self, file_path: str) -> str:
+        """
+        Get the format a roster file is read as.
+
+        Args:
+            file_path (str): The path of the roster file.
+
+        Returns:
+            str: The configured format, or the format detected from the file extension.
+            Files with an unknown extension are read as csv.
+        """
+        if self.format != "auto":
+            return self.format
+        name = file_path[: -len(".gz")] if file_path.endswith(".gz") else file_path
+        extension = os.path.splitext(name)[1].lower()
+        for format_name, roster_format in ROSTER_FORMATS.items():
+            if extension in roster_format.extensions:
+                return format_name
+        return "csv"
+
+    def normalize(self, value: str) -> str:
+        """
+        Normalize a username as configured. The result is interned, so a user listed in
+        several rosters, or loaded again on reload, is stored only once.
+
+        Args:
+            value (str): The raw username.
+
+        Returns:
+            str: The normalized username.
+        """
+        if self.strip:
+            value = value.strip()
+        if self.lowercase:
+            value = value.lower()
+        return sys.intern(value)
+
+    def iter_rows(self, file_path: str) -> Iterator[RosterRow]:
+        """
+        Stream the rows of a roster file. Gzip compressed files are detected by their content
+        and decompressed on the fly.
+
+        Args:
+            file_path (str): The path of the roster file.
+
+        Yields:
+            RosterRow: The rows of the file.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            RosterError: If the file can not be parsed.
+        """
+        reader = ROSTER_FORMATS[self.get_format(file_path)].reader
+        with open(file_path, "rb") as raw:
+            binary = (
+                gzip.GzipFile(fileobj=raw) if raw.peek(2)[:2] == GZIP_MAGIC else raw
+            )
+            with io.TextIOWrapper(binary, encoding=self.encoding, newline="") as file:
+                try:
+                    yield from reader(file, self)
+                except (
+                    RosterError,
+                    csv.Error,
+                    UnicodeDecodeError,
+                    EOFError,
+                    OSError,
+                ) as error:
+                    raise RosterError(f"Can not read {file_path}: {error}") from error
+
+    def load(
+        self, file_path: str, member_filter: Optional[Callable[[str], bool]] = None
+    ) -> Tuple[List[str], RosterReport]:
+        """
+        Load the usernames of a roster file.
+
+        Usernames are normalized and only their first occurrence is kept. A missing file gives
+        an empty roster, malformed rows and usernames that are not a valid directory name are
+        skipped. Both are recorded in the report.
+
+        Args:
+            file_path (str): The path of the roster file.
+            member_filter (Optional[Callable[[str], bool]]): If given, only the usernames it
+                returns True for are kept.
+
+        Returns:
+            Tuple[List[str], RosterReport]: The usernames in the order they appear in the file
+            and the report.
+
+        Raises:
+            RosterError: If the file can not be parsed, or it has malformed rows and strict is
+                set.
+        """
+        report = RosterReport(file=file_path, format=self.get_format(file_path))
+        members: Dict[str, None] = dict()
+        with metrics.timer("roster_load_seconds"):
+            try:
+                for row in self.iter_rows(file_path):
+                    report.rows += 1
+                    username = None if row.value is None else self.normalize(row.value)
+                    error = row.error
+                    if username and not is_safe_username(username):
+                        error = f"username {username!r} is not a valid directory name"
+                        username = None
+                    if not username:
+                        report.malformed += 1
+                        if len(report.errors) < MAX_REPORTED_ERRORS:
+                            report.errors.append(
+                                f"line {row.line}: {error or 'empty username'}"
+                            )
+                    elif username in members:
+                        report.duplicates += 1
+                    elif member_filter is not None and not member_filter(username):
+                        report.excluded += 1
+                    else:
+                        members[username] = None
+            except FileNotFoundError:
+                report.missing = True
+        report.members = len(members)
+        metrics.observe("roster_size", report.members)
+        if report.malformed:
+            metrics.increment("roster_malformed_rows_total", report.malformed)
+            if self.strict:
+                raise RosterError(
+                    f"{report.malformed} malformed row(s) in {file_path}: "
+                    + "; ".join(report.errors)
+                )
+        return list(members), report
+
+
+def is_safe_username(username: str) -> bool:
+    """
+    Whether a username can be used as a single directory name. Usernames are part of the
+    sub-paths of the volume mounts, so a name like "../alice" would point to the directory
+    of another user.
+    """
+    separators = {"/", os.sep, os.altsep} - {None}
+    return username not in (".", "..") and not any(
+        separator in username for separator in separators
+    )
+
+
+def get_roster_candidates(prefix: str) -> List[str]:
+    """
+    Get the paths a roster file of a course is looked up at, in order. These are the
+    extensions of all registered formats, each also with a .gz suffix.
+
+    Args:
+        prefix (str): The path of the roster file without extension.
+
+    Returns:
+        List[str]: The candidate paths of the roster file.
+    """
+    return [
+        file_path
+        for roster_format in ROSTER_FORMATS.values()
+        for extension in roster_format.extensions
+        for file_path in (prefix + extension, prefix + extension + ".gz")
+    ]
+
+
+def find_roster_file(prefix: str) -> str:
+    """
+    Find the roster file of a course among the extensions of all registered formats,
+    each also with a .gz suffix.
+
+    Args:
+        prefix (str): The path of the roster file without extension.
+
+    Returns:
+        str: The first roster file that exists, or the csv file if there is none.
+    """
+    for file_path in get_roster_candidates(prefix):
+        if os.path.isfile(file_path):
+            return file_path
+    return prefix + ".csv"
+
+
+def _read_delimited(
+    file: TextIO, source: RosterSource, delimiter: str
+) -> Iterator[RosterRow]:
+    reader = csv.reader(file, delimiter=source.delimiter or delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    if source.column not in header:
+        raise RosterError(
+            f"Column {source.column!r} not found in the header, found {header}"
+        )
+    index = header.index(source.column)
+    for row in reader:
+        if not any(row):
+            continue
+        if len(row) <= index:
+            yield RosterRow(
+                reader.line_num,
+                None,
+                f"expected at least {index + 1} field(s), found {len(row)}",
+            )
+        else:
+            yield RosterRow(reader.line_num, row[index], None)
+
+
+def read_csv(file: TextIO, source: RosterSource) -> Iterator[RosterRow]:
+    """
+    Stream the usernames from the configured column of a CSV file with a header.
+    """
+    return _read_delimited(file, source, ",")
+
+
+def read_tsv(file: TextIO, source: RosterSource) -> Iterator[RosterRow]:
+    """
+    Stream the usernames from the configured column of a tab separated file with a header.
+    """
+    return _read_delimited(file, source, "\t")
+
+
+def read_lines(file: TextIO, source: RosterSource) -> Iterator[RosterRow]:
+    """
+    Stream the usernames from a file with one username per line. Empty lines and lines
+    starting with '#' are ignored.
+    """
+    for line_number, line in enumerate(file, start=1):
+        value = line.rstrip("\r\n")
+        if not value.strip() or value.lstrip().startswith("#"):
+            continue
+        yield RosterRow(line_number, value, None)
+
+
+register_roster_format("csv", read_csv, (".csv",))
+register_roster_format("tsv", read_tsv, (".tsv", ".tab"))
+register_roster_format("lines", read_lines, (".txt", ".lst"))
@@ -0,0 +1,100 @@
+import bisect
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# The (start, end) of a course as Unix timestamps, None for an open bound
+Window = Tuple[Optional[float], Optional[float]]
+
+
+class ExamSchedule:
+    """
+    An interval index of the time windows of the courses.
+
+    A course is active from its start, inclusive, to its end, exclusive. The start and end
+    times of all courses split the time line into segments in which the active courses do
+    not change. The active courses of every segment are computed once, so a lookup is a
+    binary search over the segment boundaries.
+
+    Args:
+        windows (List[Window]): The window of each course, indexed like the courses.
+    """
+
+    def __init__(self, windows: List[Window]):
+        starts: Dict[float, List[int]] = dict()
+        ends: Dict[float, List[int]] = dict()
+        active: Set[int] = set()
+        for index, (start, end) in enumerate(windows):
+            if start is None:
+                active.add(index)
+            else:
+                starts.setdefault(start, []).append(index)
+            if end is not None:
+                ends.setdefault(end, []).append(index)
+        self.course_count = len(windows)
+        self._boundaries = sorted(set(starts) | set(ends))
+        self._segments = [frozenset(active)]
+        for boundary in self._boundaries:
+            active.update(starts.get(boundary, ()))
+            active.difference_update(ends.get(boundary, ()))
+            self._segments.append(frozenset(active))
+
+    def get_segment(self, now: float) -> int:
+        """
+        Get the segment of the time line a point in time falls into.
+
+        Args:
+            now (float): The point in time as a Unix timestamp.
+
+        Returns:
+            int: The index of the segment.
+        """
+        return bisect.bisect_right(self._boundaries, now)
+
+    def get_segment_bounds(self, segment: int) -> Window:
+        """
+        Get the start, inclusive, and end, exclusive, of a segment.
+
+        Args:
+            segment (int): The index of the segment.
+
+        Returns:
+            Window: The bounds of the segment, None for an open bound.
+        """
+        start = self._boundaries[segment - 1] if segment > 0 else None
+        end = self._boundaries[segment] if segment < len(self._boundaries) else None
+        return start, end
+
+    def get_active(self, segment: int) -> FrozenSet[int]:
+        """
+        Get the indices of the courses that are active in a segment.
+
+        Args:
+            segment (int): The index of the segment.
+
+        Returns:
+            FrozenSet[int]: The indices of the active courses.
+        """
+        return self._segments[segment]
+
+    def active_at(self, now: float) -> FrozenSet[int]:
+        """
+        Get the indices of the courses that are active at a point in time.
+
+        Args:
+            now (float): The point in time as a Unix timestamp.
+
+        Returns:
+            FrozenSet[int]: The indices of the active courses.
+        """
+        return self._segments[self.get_segment(now)]
+
+    def next_change(self, now: float) -> Optional[float]:
+        """
+        Get the next time a course starts or ends.
+
+        Args:
+            now (float): The point in time as a Unix timestamp.
+
+        Returns:
+            Optional[float]: The next start or end after now, None if there is none.
+        """
+        return self.get_segment_bounds(self.get_segment(now))[1]
@@ -1,11 +1,26 @@
+import hashlib
 import os
+from typing import Dict, List, Optional, Tuple, Union
 
 import yaml
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 
-from .base import Image, ModelWithCommands, Resources
+from .. import metrics
+from .base import BaseCourse, Image, ModelWithCommands, Resources
+from .course import StudentCourse
 from .mounts import Mounts
-from .nbgrader import NbGrader
+from .nbgrader import CourseKey, NbGrader
+from .roster import RosterReport
+from .schedule import Window
+from .shard import ShardSpec
+from .snapshot import (
+    construct_model,
+    hash_source_files,
+    load_snapshot,
+    save_snapshot,
+)
+from .startup import StartupScript, append_file_command, render_startup_script
+from .utils import check_resource_limits
 
 
 class ServerConfig(ModelWithCommands):
@@ -30,16 +45,323 @@ class ServerConfig(ModelWithCommands):
         description="Mounts configuration",
     )
 
+    _spawner_settings: Dict[Optional[CourseKey], Dict[str, Union[str, float]]] = (
+        PrivateAttr(dict())
+    )
+
+    _startup_scripts: Dict[Tuple[Optional[CourseKey], str], StartupScript] = (
+        PrivateAttr(dict())
+    )
+
+    _evicted_segment: Optional[int] = PrivateAttr(None)
+
+    def model_post_init(self, __context) -> None:
+        self.mounts.compile_templates(self.nbgrader.student_courses)
+        for course in self.nbgrader.student_courses:
+            self.get_spawner_settings(course)
+
+    def get_course_image(self, course: Optional[StudentCourse] = None) -> Image:
+        """
+        Get the image of a course, falling back to the global image.
+
+        Args:
+            course (Optional[StudentCourse]): The course. Defaults to None, which returns the
+                global image.
+
+        Returns:
+            Image: The image of the course.
+        """
+        if course is not None and course.image is not None:
+            return course.image
+        return self.image
+
+    def get_course_resources(self, course: Optional[StudentCourse] = None) -> Resources:
+        """
+        Get the resources of a course. Every setting the course does not set explicitly is
+        taken from the global resources.
+
+        Args:
+            course (Optional[StudentCourse]): The course. Defaults to None, which returns the
+                global resources.
+
+        Returns:
+            Resources: The resources of the course.
+
+        Raises:
+            ValueError: If a guarantee of the merged resources exceeds its limit.
+        """
+        if course is None or course.resources is None:
+            return check_resource_limits(self.resources)
+        resources = self.resources.model_copy(
+            update=course.resources.model_dump(exclude_unset=True)
+        )
+        try:
+            return check_resource_limits(resources)
+        except ValueError as error:
+            raise ValueError(f"{course.course_id}: {error}") from None
+
+    def get_spawner_settings(
+        self, course: Optional[StudentCourse] = None
+    ) -> Dict[str, Union[str, float]]:
+        """
+        Get the KubeSpawner image and resource settings of a course. The settings are
+        resolved once per course.
+
+        Args:
+            course (Optional[StudentCourse]): The course. Defaults to None, which returns the
+                global settings.
+
+        Returns:
+            Dict[str, Union[str, float]]: The KubeSpawner attributes and their values.
+        """
+        key = course.course_key if course is not None else None
+        settings = self._spawner_settings.get(key)
+        if settings is None:
+            image = self.get_course_image(course)
+            resources = self.get_course_resources(course)
+            settings = dict(
+                image=image.full_image_name,
+                image_pull_policy=image.pullPolicy,
+                cpu_guarantee=resources.cpu_guarantee,
+                cpu_limit=resources.cpu_limit,
+                mem_guarantee=resources.mem_guarantee,
+                mem_limit=resources.mem_limit,
+            )
+            self._spawner_settings[key] = settings
+        return dict(settings)
+
+    def get_startup_script(
+        self,
+        course: Optional[StudentCourse] = None,
+        nbgrader_config_file: str = "/etc/jupyter/nbgrader_config.py",
+    ) -> StartupScript:
+        """
+        Render the server commands, the course commands and the nbgrader exchange settings
+        of a course into a single startup script. The exchange settings are appended to the
+        nbgrader config in one step instead of one echo per setting. The script is rendered
+        once per course.
+
+        Args:
+            course (Optional[StudentCourse]): The course. Defaults to None, which only renders
+                the server commands.
+            nbgrader_config_file (str): The nbgrader config file the exchange settings are
+                appended to.
+
+        Returns:
+            StartupScript: The script and its content hash.
+        """
+        key = (course.course_key if course is not None else None, nbgrader_config_file)
+        script = self._startup_scripts.get(key)
+        if script is None:
+            commands = list(self.all_commands)
+            if course is not None:
+                commands.extend(course.all_commands)
+                commands.append(
+                    append_file_command(
+                        nbgrader_config_file, course.exchange.get_config_lines()
+                    )
+                )
+            script = render_startup_script(commands)
+            self._startup_scripts[key] = script
+        return script
+
+    def evict_inactive_courses(self, now: Optional[float] = None) -> int:
+        """
+        Remove the cached mounts, mount templates, spawner settings and startup scripts of
+        the courses that are not active, see NbGrader.get_active_courses. The caches are
+        only scanned when the active courses changed since the last call.
+
+        Args:
+            now (Optional[float]): The point in time as a Unix timestamp. Defaults to the
+                current time.
+
+        Returns:
+            int: The number of removed mount cache entries.
+        """
+        active = self.nbgrader.get_active_courses(now)
+        if active is None or active.segment == self._evicted_segment:
+            return 0
+        self._evicted_segment = active.segment
+        inactive = {
+            view.course_key for view in self.nbgrader.course_views
+        } - active.course_keys
+        self._spawner_settings = {
+            key: settings
+            for key, settings in self._spawner_settings.items()
+            if key not in inactive
+        }
+        self._startup_scripts = {
+            key: script
+            for key, script in self._startup_scripts.items()
+            if key[0] not in inactive
+        }
+        evicted = self.mounts.evict_courses(
+            {
+                (BaseCourse.make_course_id(name, semester_id), exam_period)
+                for name, semester_id, exam_period in inactive
+            }
+        )
+        metrics.increment("mount_cache_evictions_total", evicted)
+        return evicted
+
+    def get_images(self) -> List[Image]:
+        """
+        Get the distinct images used by the global config and all active courses.
+
+        Returns:
+            List[Image]: The images in the order they are first used.
+        """
+        images = {self.image.full_image_name: self.image}
+        for view in self.nbgrader.course_views:
+            image = self.get_course_image(view.course)
+            images.setdefault(image.full_image_name, image)
+        return list(images.values())
+
     @classmethod
-    def from_yaml_file(cls, file_path: str):
+    def from_yaml_file(
+        cls,
+        file_path: str,
+        max_workers: int = 1,
+        loaded_courses: Optional[Dict[CourseKey, StudentCourse]] = None,
+        cache_dir: Optional[str] = None,
+        shard: Optional[ShardSpec] = None,
+        lazy: bool = False,
+        course_cache_size: int = 64,
+    ):
+        """
+        Load the server config and all active student courses.
+
+        If a cache directory is given, a compiled snapshot of the config is kept there. It is
+        used instead of parsing and validating the files again as long as none of the source
+        files changed. In lazy mode no snapshot is used, see NbGrader.from_dict.
+
+        Args:
+            file_path (str): The path of the server config file.
+            max_workers (int): The number of threads used to load the course files.
+            loaded_courses (Optional[Dict[CourseKey, StudentCourse]]): Courses that are
+                already loaded and are reused instead of being read again.
+            cache_dir (Optional[str]): The directory for the compiled snapshot. Defaults to
+                None, which disables the snapshot.
+            shard (Optional[ShardSpec]): If given, only the courses and course members of
+                this shard are loaded.
+            lazy (bool): Whether to load only the rosters at startup and the full courses
+                on first use.
+            course_cache_size (int): The number of courses kept loaded in lazy mode.
+
+        Returns:
+            ServerConfig: The loaded server config.
+        """
+        with metrics.timer("config_load_seconds"):
+            return cls._load_yaml_file(
+                file_path,
+                max_workers,
+                loaded_courses,
+                None if lazy else cache_dir,
+                shard,
+                lazy,
+                course_cache_size,
+            )
+
+    @classmethod
+    def _load_yaml_file(
+        cls,
+        file_path: str,
+        max_workers: int,
+        loaded_courses: Optional[Dict[CourseKey, StudentCourse]],
+        cache_dir: Optional[str],
+        shard: Optional[ShardSpec] = None,
+        lazy: bool = False,
+        course_cache_size: int = 64,
+    ):
+        variant = shard.variant if shard is not None else ""
+        if cache_dir:
+            snapshot = load_snapshot(cache_dir, file_path, variant)
+            if snapshot is not None:
+                try:
+                    server_config = cls._from_snapshot(snapshot)
+                except (KeyError, TypeError, ValueError):
+                    server_config = None
+                if server_config is not None:
+                    metrics.increment("config_snapshot_hits_total")
+                    return server_config
+            metrics.increment("config_snapshot_misses_total")
         config_root = os.path.dirname(file_path)
-        with open(file_path, "r") as file:
-            yaml_config = yaml.safe_load(file)
-            return cls(
-                config_root=config_root,
-                commands=yaml_config.get("commands", dict()),
-                image=Image(**yaml_config["image"]),
-                resources=Resources(**yaml_config["resources"]),
-                nbgrader=NbGrader.from_dict(config_root, yaml_config["nbgrader"]),
-                mounts=Mounts(**yaml_config["mounts"]),
+        with open(file_path, "rb") as file:
+            data = file.read()
+        yaml_config = yaml.safe_load(data)
+        if cache_dir:
+            sources = {os.path.abspath(file_path): hashlib.sha256(data).hexdigest()}
+            sources.update(
+                hash_source_files(
+                    NbGrader.get_source_files(
+                        config_root, yaml_config["nbgrader"], shard
+                    )
+                )
             )
+        server_config = cls(
+            config_root=config_root,
+            commands=yaml_config.get("commands", dict()),
+            image=Image(**yaml_config["image"]),
+            resources=Resources(**yaml_config["resources"]),
+            nbgrader=NbGrader.from_dict(
+                config_root,
+                yaml_config["nbgrader"],
+                max_workers=max_workers,
+                loaded_courses=loaded_courses,
+                shard=shard,
+                lazy=lazy,
+                course_cache_size=course_cache_size,
+            ),
+            mounts=Mounts(**yaml_config["mounts"]),
+        )
+        if cache_dir:
+            save_snapshot(
+                cache_dir,
+                file_path,
+                sources,
+                server_config._to_snapshot(
+                    NbGrader.get_course_windows(yaml_config["nbgrader"])
+                ),
+                variant,
+            )
+        return server_config
+
+    def _to_snapshot(self, windows: Dict[CourseKey, Window]) -> Dict[str, object]:
+        """
+        Dump the config with the state that is not part of its fields, i.e. the roster
+        reports and the course windows.
+        """
+        return dict(
+            # Only the explicitly set fields are dumped, so the settings that fall back to
+            # the global ones are the same after the snapshot is restored
+            config=self.model_dump(mode="json", exclude_unset=True),
+            roster_reports=[
+                None
+                if course.roster_report is None
+                else course.roster_report.model_dump(mode="json")
+                for course in self.nbgrader.student_courses
+            ],
+            windows=[[list(key), list(window)] for key, window in windows.items()],
+        )
+
+    @classmethod
+    def _from_snapshot(cls, snapshot: Dict[str, object]) -> "ServerConfig":
+        """
+        Restore a config dumped by _to_snapshot without validating it again.
+        """
+        data = snapshot["config"]
+        student_courses = []
+        for course_data, report in zip(
+            data["nbgrader"]["student_courses"], snapshot["roster_reports"]
+        ):
+            course = construct_model(StudentCourse, course_data)
+            if report is not None:
+                course._roster_report = construct_model(RosterReport, report)
+            student_courses.append(course)
+        nbgrader = construct_model(
+            NbGrader, data["nbgrader"], student_courses=student_courses
+        )
+        nbgrader._set_schedule(
+            {tuple(key): tuple(window) for key, window in snapshot["windows"]}
+        )
+        return construct_model(cls, data, nbgrader=nbgrader)
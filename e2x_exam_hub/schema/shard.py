@@ -0,0 +1,208 @@
+import bisect
+import hashlib
+import json
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+SHARD_BY = ("user", "course")
+
+
+def stable_hash(key: str) -> int:
+    """
+    Hash a string to a 64 bit integer that is the same in every process, unlike hash().
+
+    Args:
+        key (str): The string to hash.
+
+    Returns:
+        int: The hash value.
+    """
+    return int.from_bytes(
+        hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def course_shard_key(course_key: Tuple[str, str, str]) -> str:
+    """
+    The key a course is sharded by, course_name.semester_id.exam_period.
+    """
+    return ".".join(course_key)
+
+
+class HashRing:
+    """
+    A consistent hash ring over the shards 0 to shard_count - 1.
+
+    Every shard is placed on the ring at several points. A key belongs to the first shard
+    found clockwise from the hash of the key. Adding a shard only moves the keys that fall on
+    the points of the new shard, about 1 / shard_count of all keys.
+
+    Args:
+        shard_count (int): The number of shards.
+        replicas (int): The number of points of each shard on the ring.
+    """
+
+    def __init__(self, shard_count: int, replicas: int = 128):
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+        self.shard_count = shard_count
+        self.replicas = replicas
+        points = sorted(
+            (stable_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in range(shard_count)
+            for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def get_shard(self, key: str) -> int:
+        """
+        Get the shard of a key.
+
+        Args:
+            key (str): The key, e.g. a username.
+
+        Returns:
+            int: The shard of the key.
+        """
+        if self.shard_count == 1:
+            return 0
+        index = bisect.bisect(self._hashes, stable_hash(key)) % len(self._hashes)
+        return self._shards[index]
+
+    def iter_shards(self, key: str) -> Iterator[int]:
+        """
+        Iterate over all shards in the order they follow the key on the ring. The first shard
+        is the shard of the key.
+
+        Args:
+            key (str): The key, e.g. a username.
+
+        Yields:
+            int: Each shard once.
+        """
+        start = bisect.bisect(self._hashes, stable_hash(key))
+        seen = set()
+        for offset in range(len(self._hashes)):
+            shard = self._shards[(start + offset) % len(self._hashes)]
+            if shard not in seen:
+                seen.add(shard)
+                yield shard
+                if len(seen) == self.shard_count:
+                    return
+
+
+class ShardSpec(NamedTuple):
+    """
+    The shard a hub serves.
+
+    Users or whole courses are assigned to shards by consistent hashing, unless a plan
+    assigns them explicitly. Keys that are not in the plan, e.g. users registered after the
+    plan was made, fall back to the hash ring.
+
+    Attributes:
+        shard_count (int): The number of shards.
+        shard_index (int): The shard of this hub, from 0 to shard_count - 1.
+        by (str): Either "user", which splits the rosters by username, or "course", which
+            assigns whole courses.
+        assignments (Dict[str, int]): The shard of each username or course key from a plan.
+        replicas (int): The number of points of each shard on the hash ring.
+    """
+
+    shard_count: int
+    shard_index: int
+    by: str = "user"
+    assignments: Dict[str, int] = dict()
+    replicas: int = 128
+
+    @classmethod
+    def from_plan_file(cls, file_path: str, shard_index: int) -> "ShardSpec":
+        """
+        Load the shard of a hub from a plan written by the shard planner.
+
+        Args:
+            file_path (str): The path of the plan file.
+            shard_index (int): The shard of this hub.
+
+        Returns:
+            ShardSpec: The shard with the assignments of the plan.
+        """
+        with open(file_path, "r") as file:
+            plan = json.load(file)
+        return cls(
+            shard_count=plan["shard_count"],
+            shard_index=shard_index,
+            by=plan["by"],
+            assignments=plan.get("assignments", dict()),
+            replicas=plan.get("replicas", 128),
+        )
+
+    def validate(self) -> "ShardSpec":
+        if self.by not in SHARD_BY:
+            raise ValueError(
+                f"Unknown shard key {self.by!r}, expected one of {SHARD_BY}"
+            )
+        if not 0 <= self.shard_index < self.shard_count:
+            raise ValueError(
+                f"shard_index must be between 0 and {self.shard_count - 1}, "
+                f"got {self.shard_index}"
+            )
+        return self
+
+    @property
+    def ring(self) -> HashRing:
+        return _get_ring(self.shard_count, self.replicas)
+
+    @property
+    def variant(self) -> str:
+        """
+        A string identifying the shard and its plan, e.g. to keep config snapshots of
+        different shards apart.
+        """
+        assignments = hashlib.sha256(
+            json.dumps(self.assignments, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return f"{self.by}:{self.shard_index}/{self.shard_count}:{assignments}"
+
+    def get_shard(self, key: str) -> int:
+        shard = self.assignments.get(key)
+        return self.ring.get_shard(key) if shard is None else shard
+
+    def includes_user(self, username: str) -> bool:
+        """
+        Check whether a user is served by this shard. With sharding by course every member
+        of a served course is served.
+        """
+        return self.by == "course" or self.get_shard(username) == self.shard_index
+
+    def includes_course(self, course_key: Tuple[str, str, str]) -> bool:
+        """
+        Check whether the roster of a course is loaded on this shard. With sharding by user
+        every course is loaded, but only with the members of this shard.
+        """
+        return (
+            self.by == "user"
+            or self.get_shard(course_shard_key(course_key)) == self.shard_index
+        )
+
+    def filter_course_keys(
+        self, course_keys: List[Tuple[str, str, str]]
+    ) -> List[Tuple[str, str, str]]:
+        return [key for key in course_keys if self.includes_course(key)]
+
+    @property
+    def member_filter(self) -> Optional[Callable[[str], bool]]:
+        """
+        The filter for the roster entries of this shard, None if all members are loaded.
+        """
+        return self.includes_user if self.by == "user" else None
+
+
+_rings: Dict[Tuple[int, int], HashRing] = dict()
+
+
+def _get_ring(shard_count: int, replicas: int) -> HashRing:
+    ring = _rings.get((shard_count, replicas))
+    if ring is None:
+        ring = HashRing(shard_count, replicas)
+        _rings[(shard_count, replicas)] = ring
+    return ring
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Type, TypeVar, Union
+
+from pydantic import VERSION as PYDANTIC_VERSION
+from pydantic import BaseModel
+
+from .._version import __version__
+from .utils import file_fingerprint
+
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_FILE = "snapshot.json"
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def hash_source_files(file_paths: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Hash the content of the source files of a config.
+
+    Args:
+        file_paths (List[str]): The paths of the source files.
+
+    Returns:
+        Dict[str, Optional[str]]: The SHA-256 hash of each file, None for missing files.
+    """
+    hashes = dict()
+    for file_path in file_paths:
+        fingerprint = file_fingerprint(file_path, use_hash=True)
+        hashes[os.path.abspath(file_path)] = fingerprint[0] if fingerprint else None
+    return hashes
+
+
+def _construct_value(annotation: Any, value: Any) -> Any:
+    if value is None:
+        return None
+    origin = getattr(annotation, "__origin__", None)
+    args = getattr(annotation, "__args__", ())
+    if origin is Union:
+        types = [arg for arg in args if arg is not type(None)]
+        return _construct_value(types[0], value) if len(types) == 1 else value
+    if origin is list:
+        return [_construct_value(args[0], item) for item in value]
+    if origin is tuple and len(args) == 2 and args[1] is Ellipsis:
+        return tuple(_construct_value(args[0], item) for item in value)
+    if origin is dict:
+        return {key: _construct_value(args[1], item) for key, item in value.items()}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return construct_model(annotation, value)
+    return value
+
+
+def construct_model(model: Type[M], data: Dict[str, Any], **values: Any) -> M:
+    """
+    Restore a model from the output of model_dump without validating it again. Nested
+    models are restored according to the annotations of the fields, model_post_init runs as
+    for a validated model.
+
+    Args:
+        model (Type[M]): The model class.
+        data (Dict[str, Any]): The dumped fields of the model.
+        **values (Any): Fields that are already restored and are used as they are.
+
+    Returns:
+        M: The restored model.
+    """
+    for name, field in model.model_fields.items():
+        if name in data and name not in values:
+            values[name] = _construct_value(field.annotation, data[name])
+    return model.model_construct(**values)
+
+
+def _write_atomic(file_path: str, data: bytes) -> None:
+    directory = os.path.dirname(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(
+    cache_dir: str, config_file: str, variant: str = ""
+) -> Optional[Dict[str, Any]]:
+    """
+    Load a compiled config snapshot if none of its source files changed.
+
+    The snapshot is only trusted if it was written by the same package and pydantic versions
+    for the same config file and variant, its own checksum matches and every source file
+    still has the hash recorded in the manifest. The snapshot is plain JSON, so reading it
+    never runs code from the cache directory. Use construct_model to restore the models
+    without running validation again.
+
+    Args:
+        cache_dir (str): The directory containing the snapshot and its manifest.
+        config_file (str): The path of the server config file.
+        variant (str): Identifies how the config was loaded, e.g. the shard of the hub.
+
+    Returns:
+        Optional[Dict[str, Any]]: The stored data, or None if there is no valid snapshot.
+    """
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILE), "r") as file:
+            manifest = json.load(file)
+        if (
+            manifest.get("version") != __version__
+            or manifest.get("pydantic_version") != PYDANTIC_VERSION
+            or manifest.get("config_file") != os.path.abspath(config_file)
+            or manifest.get("variant", "") != variant
+        ):
+            return None
+        sources = manifest["sources"]
+        if hash_source_files(list(sources)) != sources:
+            return None
+        with open(os.path.join(cache_dir, SNAPSHOT_FILE), "rb") as file:
+            data = file.read()
+        if hashlib.sha256(data).hexdigest() != manifest["snapshot_sha256"]:
+            return None
+        return json.loads(data)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_snapshot(
+    cache_dir: str,
+    config_file: str,
+    sources: Dict[str, Optional[str]],
+    data: Dict[str, Any],
+    variant: str = "",
+) -> bool:
+    """
+    Write a compiled config snapshot and a manifest of the hashes of its source files.
+
+    The hashes have to be computed before the source files are parsed, so that a file changing
+    during the load invalidates the snapshot instead of being recorded with its new hash.
+    The snapshot is written before the manifest, so a reader never sees a manifest that points
+    to an incomplete snapshot.
+
+    Args:
+        cache_dir (str): The directory to write the snapshot and its manifest to.
+        config_file (str): The path of the server config file.
+        sources (Dict[str, Optional[str]]): The hash of each file the config was loaded from,
+            as returned by hash_source_files.
+        data (Dict[str, Any]): The data to store, e.g. the output of model_dump. It has to
+            be serializable as JSON.
+        variant (str): Identifies how the config was loaded, e.g. the shard of the hub.
+
+    Returns:
+        bool: True if the snapshot was written, False if the cache directory is not writable.
+    """
+    data = json.dumps(data).encode("utf-8")
+    manifest = dict(
+        version=__version__,
+        pydantic_version=PYDANTIC_VERSION,
+        config_file=os.path.abspath(config_file),
+        variant=variant,
+        sources=sources,
+        snapshot_sha256=hashlib.sha256(data).hexdigest(),
+    )
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(os.path.join(cache_dir, SNAPSHOT_FILE), data)
+        _write_atomic(
+            os.path.join(cache_dir, MANIFEST_FILE),
+            json.dumps(manifest, indent=2).encode("utf-8"),
+        )
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import os
+import shlex
+import tempfile
+from typing import Iterable, List, NamedTuple
+
+# Like the separate commands, a failing command does not stop the script
+SCRIPT_HEADER = ["#!/bin/sh"]
+
+
+class StartupScript(NamedTuple):
+    """
+    A startup script that runs all commands of a server in a single step.
+
+    Attributes:
+        content (str): The shell script.
+        sha256 (str): The SHA-256 hash of the content, which identifies the script.
+    """
+
+    content: str
+    sha256: str
+
+    @property
+    def file_name(self) -> str:
+        return f"startup-{self.sha256[:16]}.sh"
+
+    @property
+    def command(self) -> str:
+        """
+        A single shell command that runs the script without needing a file in the container.
+
+        Returns:
+            str: The command.
+        """
+        encoded = base64.b64encode(self.content.encode("utf-8")).decode("ascii")
+        return f"echo {encoded} | base64 -d | sh"
+
+    def write(self, directory: str) -> str:
+        """
+        Write the script to a directory, named after its hash. Since the name is derived from
+        the content, an existing file is not written again.
+
+        Args:
+            directory (str): The directory to write the script to.
+
+        Returns:
+            str: The path of the script.
+        """
+        path = os.path.join(directory, self.file_name)
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as file:
+                file.write(self.content)
+            os.chmod(tmp_path, 0o755)
+            os.replace(tmp_path, path)
+        return path
+
+
+def append_file_command(file_path: str, lines: List[str]) -> str:
+    """
+    Build a command that appends lines to a file in one step using a here-document.
+
+    Args:
+        file_path (str): The file to append to.
+        lines (List[str]): The lines to append.
+
+    Returns:
+        str: The command.
+    """
+    delimiter = "E2X_EXAM_HUB_EOF"
+    return "\n".join(
+        [f"cat >> {shlex.quote(file_path)} <<'{delimiter}'"] + lines + [delimiter]
+    )
+
+
+def render_startup_script(commands: Iterable[str]) -> StartupScript:
+    """
+    Render commands into a single startup script.
+
+    Duplicate commands are removed, keeping the first occurrence, so the order of the script
+    is stable for the same commands.
+
+    Args:
+        commands (Iterable[str]): The commands in the order they are executed.
+
+    Returns:
+        StartupScript: The rendered script.
+    """
+    unique_commands = list(dict.fromkeys(commands))
+    content = "\n".join(SCRIPT_HEADER + unique_commands) + "\n"
+    return StartupScript(
+        content=content, sha256=hashlib.sha256(content.encode("utf-8")).hexdigest()
+    )
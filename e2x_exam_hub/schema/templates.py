@@ -0,0 +1,90 @@
+from typing import Dict, List, NamedTuple, Sequence, Tuple, Union
+
+# Stands in for the username while a template is compiled. It can not occur in a path.
+USERNAME_PLACEHOLDER = "\x00username\x00"
+
+
+class MountTemplate(NamedTuple):
+    """
+    A volume mount with all course specific parts resolved.
+
+    The paths are stored as the parts around the username, so rendering a mount for a user
+    is a plain string join.
+
+    Attributes:
+        name (str): Name of the volume.
+        readOnly (bool): Whether the mount is read-only.
+        subPath (Tuple[str, ...]): The parts of the sub-path around the username.
+        mountPath (Tuple[str, ...]): The parts of the mount path around the username.
+    """
+
+    name: str
+    readOnly: bool
+    subPath: Tuple[str, ...]
+    mountPath: Tuple[str, ...]
+
+    @classmethod
+    def compile(cls, mount: Dict[str, Union[str, bool]]) -> "MountTemplate":
+        """
+        Compile a mount that was built for USERNAME_PLACEHOLDER into a template.
+
+        Args:
+            mount (Dict[str, Union[str, bool]]): The mount built for the placeholder user.
+
+        Returns:
+            MountTemplate: The compiled template.
+        """
+        return cls(
+            name=mount["name"],
+            readOnly=mount["readOnly"],
+            subPath=tuple(mount["subPath"].split(USERNAME_PLACEHOLDER)),
+            mountPath=tuple(mount["mountPath"].split(USERNAME_PLACEHOLDER)),
+        )
+
+    def render(self, username: str) -> Dict[str, Union[str, bool]]:
+        """
+        Render the mount for a user.
+
+        Args:
+            username (str): The username of the user.
+
+        Returns:
+            Dict[str, Union[str, bool]]: The volume mount of the user.
+        """
+        return dict(
+            name=self.name,
+            readOnly=self.readOnly,
+            subPath=username.join(self.subPath),
+            mountPath=username.join(self.mountPath),
+        )
+
+
+def compile_mount_templates(
+    mounts: List[Dict[str, Union[str, bool]]],
+) -> Tuple[MountTemplate, ...]:
+    """
+    Compile the mounts of a course that were built for USERNAME_PLACEHOLDER into templates.
+
+    Args:
+        mounts (List[Dict[str, Union[str, bool]]]): The mounts built for the placeholder user.
+
+    Returns:
+        Tuple[MountTemplate, ...]: The compiled templates in the order of the mounts.
+    """
+    return tuple(MountTemplate.compile(mount) for mount in mounts)
+
+
+def render_mount_templates(
+    templates: Sequence[MountTemplate], username: str
+) -> List[Dict[str, Union[str, bool]]]:
+    """
+    Render compiled mount templates for a user.
+
+    Args:
+        templates (Sequence[MountTemplate]): The compiled templates of a course.
+        username (str): The username of the user.
+
+    Returns:
+        List[Dict[str, Union[str, bool]]]: The volume mounts of the user.
+    """
+    return [template.render(username) for template in templates]
@@ -1,24 +1,126 @@
-from typing import List
+import hashlib
+import os
+import re
+from typing import List, Optional, Tuple, Union
 
-import pandas as pd
+from .base import Resources
+from .roster import RosterSource
 
+Fingerprint = Optional[Tuple]
 
-def load_user_list(user_list_file: str) -> List[str]:
+# Memory units as understood by KubeSpawner, all of them are powers of 1024
+MEMORY_UNITS = dict(K=1024, M=1024**2, G=1024**3, T=1024**4)
+MEMORY_PATTERN = re.compile(r"\s*([0-9]*\.?[0-9]+)\s*(?:([KMGT])i?)?\s*")
+CPU_PATTERN = re.compile(r"\s*([0-9]*\.?[0-9]+)\s*(m?)\s*")
+
+
+def file_fingerprint(file_path: str, use_hash: bool = False) -> Fingerprint:
     """
-    Load a list of usernames from a CSV file.
+    Compute a fingerprint of a file that changes whenever the file changes.
 
     Args:
-        user_list_file (str): The path to the CSV file containing the user list.
+        file_path (str): The path of the file.
+        use_hash (bool): Whether to hash the content of the file instead of using its
+            modification time and size.
 
     Returns:
-        List[str]: A list of usernames extracted from the CSV file. If the file is not found,
-        returns an empty list.
+        Fingerprint: The fingerprint of the file, or None if the file does not exist.
     """
-    users = []
     try:
-        userlist = pd.read_csv(user_list_file)
-        if "Username" in userlist.columns:
-            users = list(userlist.Username)
+        if use_hash:
+            with open(file_path, "rb") as file:
+                return (hashlib.sha256(file.read()).hexdigest(),)
+        stat = os.stat(file_path)
+        return (stat.st_mtime_ns, stat.st_size)
     except FileNotFoundError:
-        pass
-    return users
+        return None
+
+
+def load_user_list(user_list_file: str) -> List[str]:
+    """
+    Load a list of usernames from a roster file with the default roster settings.
+
+    Args:
+        user_list_file (str): The path to the roster file containing the user list.
+
+    Returns:
+        List[str]: A list of usernames extracted from the roster file. If the file is not
+        found, returns an empty list.
+
+    Raises:
+        RosterError: If the file can not be parsed, e.g. because it has no Username column.
+            The message names the file.
+    """
+    return RosterSource().load(user_list_file)[0]
+
+
+def parse_memory(value: Union[str, float]) -> int:
+    """
+    Parse a memory quantity like "1.0G", "512M" or "2Gi" into bytes.
+
+    Args:
+        value (Union[str, float]): The quantity. Numbers without a unit are bytes.
+
+    Returns:
+        int: The quantity in bytes.
+
+    Raises:
+        ValueError: If the value is not a valid memory quantity.
+    """
+    if isinstance(value, (int, float)):
+        # str() of a small or large float uses an exponent, which is not a quantity
+        return int(value)
+    match = MEMORY_PATTERN.fullmatch(str(value))
+    if match is None:
+        raise ValueError(f"Invalid memory quantity {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * MEMORY_UNITS.get(unit, 1))
+
+
+def parse_cpu(value: Union[str, float]) -> float:
+    """
+    Parse a CPU quantity like 0.5, "2" or "500m" into cores.
+
+    Args:
+        value (Union[str, float]): The quantity. A trailing "m" means millicores.
+
+    Returns:
+        float: The quantity in cores.
+
+    Raises:
+        ValueError: If the value is not a valid CPU quantity.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = CPU_PATTERN.fullmatch(str(value))
+    if match is None:
+        raise ValueError(f"Invalid CPU quantity {value!r}")
+    number, milli = match.groups()
+    return float(number) / 1000 if milli else float(number)
+
+
+def check_resource_limits(resources: Resources) -> Resources:
+    """
+    Check that the guaranteed CPU and memory do not exceed their limits, which KubeSpawner
+    would only report when the pod is created.
+
+    Args:
+        resources (Resources): The resources to check.
+
+    Returns:
+        Resources: The unchanged resources.
+
+    Raises:
+        ValueError: If a guarantee exceeds its limit or a quantity is invalid.
+    """
+    if parse_cpu(resources.cpu_guarantee) > parse_cpu(resources.cpu_limit):
+        raise ValueError(
+            f"cpu_guarantee {resources.cpu_guarantee} exceeds cpu_limit "
+            f"{resources.cpu_limit}"
+        )
+    if parse_memory(resources.mem_guarantee) > parse_memory(resources.mem_limit):
+        raise ValueError(
+            f"mem_guarantee {resources.mem_guarantee} exceeds mem_limit "
+            f"{resources.mem_limit}"
+        )
+    return resources
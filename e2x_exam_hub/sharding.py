@@ -0,0 +1,236 @@
+from typing import Dict, List, Optional, Tuple
+
+from .schema import ServerConfig, StudentCourse
+from .schema.shard import SHARD_BY, HashRing, course_shard_key
+from .schema.utils import parse_memory
+
+# Resource guarantees of one user: (cpu_guarantee, mem_guarantee in bytes)
+Demand = Tuple[float, int]
+
+
+class ShardPlan:
+    """
+    An assignment of users or courses to shards and the resulting balance.
+
+    Attributes:
+        shard_count (int): The number of shards.
+        by (str): Whether users or whole courses are assigned.
+        weighted (bool): Whether the assignment balances the resource guarantees.
+        load_factor (float): How far above the average a shard may be loaded in a weighted
+            plan, e.g. 0.25 for 125% of the average.
+        replicas (int): The number of points of each shard on the hash ring.
+        assignments (Dict[str, int]): The shard of each username or course key.
+        shards (List[Dict[str, float]]): The courses, users, CPU and memory guarantees of
+            each shard.
+        users_on_multiple_shards (int): Users with courses on several shards, which can only
+            happen when sharding by course.
+    """
+
+    def __init__(
+        self,
+        shard_count: int,
+        by: str,
+        weighted: bool,
+        load_factor: float,
+        replicas: int,
+    ):
+        self.shard_count = shard_count
+        self.by = by
+        self.weighted = weighted
+        self.load_factor = load_factor
+        self.replicas = replicas
+        self.assignments: Dict[str, int] = dict()
+        self.shards: List[Dict[str, float]] = [
+            dict(courses=0, users=0, cpu_guarantee=0.0, mem_guarantee=0)
+            for _ in range(shard_count)
+        ]
+        self.users_on_multiple_shards = 0
+
+    @property
+    def balance(self) -> Dict[str, float]:
+        """
+        The imbalance of each quantity, the largest shard divided by the average shard.
+        1.0 is a perfect balance.
+
+        Returns:
+            Dict[str, float]: The imbalance of the users, CPU and memory guarantees.
+        """
+        balance = dict()
+        for quantity in ("users", "cpu_guarantee", "mem_guarantee"):
+            values = [shard[quantity] for shard in self.shards]
+            mean = sum(values) / len(values)
+            balance[quantity] = max(values) / mean if mean else 1.0
+        return balance
+
+    def count_moved(self, previous_assignments: Dict[str, int]) -> int:
+        """
+        Count the keys that are assigned to a different shard than in a previous plan.
+
+        Args:
+            previous_assignments (Dict[str, int]): The assignments of the previous plan.
+
+        Returns:
+            int: The number of keys in both plans with a different shard.
+        """
+        return sum(
+            1
+            for key, shard in self.assignments.items()
+            if previous_assignments.get(key, shard) != shard
+        )
+
+    def as_dict(self, include_assignments: Optional[bool] = None) -> Dict[str, object]:
+        """
+        The plan as written to a plan file, which ShardSpec.from_plan_file reads.
+
+        Args:
+            include_assignments (Optional[bool]): Whether to include the assignments.
+                Defaults to None, which includes them only for weighted plans. Unweighted
+                assignments are computed from the hash ring by every hub.
+
+        Returns:
+            Dict[str, object]: The plan.
+        """
+        if include_assignments is None:
+            include_assignments = self.weighted
+        return dict(
+            shard_count=self.shard_count,
+            by=self.by,
+            weighted=self.weighted,
+            load_factor=self.load_factor,
+            replicas=self.replicas,
+            assignments=dict(self.assignments) if include_assignments else dict(),
+            report=dict(
+                shards=[dict(shard) for shard in self.shards],
+                balance=self.balance,
+                users_on_multiple_shards=self.users_on_multiple_shards,
+            ),
+        )
+
+
+def _get_demand(server_config: ServerConfig, course: StudentCourse) -> Demand:
+    resources = server_config.get_course_resources(course)
+    return resources.cpu_guarantee, parse_memory(resources.mem_guarantee)
+
+
+def _assign(
+    ring: HashRing,
+    weights: Dict[str, float],
+    weighted: bool,
+    load_factor: float,
+) -> Dict[str, int]:
+    if not weighted:
+        return {key: ring.get_shard(key) for key in weights}
+    # Consistent hashing with bounded loads: a key goes to the first shard on the ring after
+    # it that stays below the capacity. Heavy keys are placed first, so they find room.
+    capacity = (1 + load_factor) * sum(weights.values()) / ring.shard_count
+    loads = [0.0] * ring.shard_count
+    assignments = dict()
+    for key in sorted(weights, key=lambda key: (-weights[key], key)):
+        weight = weights[key]
+        shard = next(
+            (
+                shard
+                for shard in ring.iter_shards(key)
+                if loads[shard] + weight <= capacity
+            ),
+            None,
+        )
+        if shard is None:
+            shard = min(range(ring.shard_count), key=loads.__getitem__)
+        loads[shard] += weight
+        assignments[key] = shard
+    return assignments
+
+
+def plan_shards(
+    server_config: ServerConfig,
+    shard_count: int,
+    by: str = "user",
+    weighted: bool = False,
+    load_factor: float = 0.25,
+    replicas: int = 128,
+) -> ShardPlan:
+    """
+    Assign the users or the courses of a config to shards by consistent hashing.
+
+    Without weights every key goes to its shard on the hash ring, which every hub computes on
+    its own. With weights the keys carry the resource guarantees of their users as the larger
+    of their CPU and memory share, and a key skips to the next shard on the ring if its own
+    shard would exceed the average load by more than the load factor. Both keep most keys on
+    their shard when a shard is added.
+
+    A user is counted with the guarantees of their first course on a shard, like the spawner
+    does.
+
+    Args:
+        server_config (ServerConfig): The config with all courses and rosters loaded.
+        shard_count (int): The number of shards.
+        by (str): "user" to split the rosters by username, "course" to assign whole courses.
+        weighted (bool): Whether to balance the resource guarantees.
+        load_factor (float): How far above the average a shard may be loaded in a weighted
+            plan.
+        replicas (int): The number of points of each shard on the hash ring.
+
+    Returns:
+        ShardPlan: The assignments and the balance report.
+    """
+    if by not in SHARD_BY:
+        raise ValueError(f"Unknown shard key {by!r}, expected one of {SHARD_BY}")
+    nbgrader = server_config.nbgrader
+    # Iterate over the views, so lazily loaded configs are planned without keeping every
+    # course model loaded at the same time
+    views = nbgrader.course_views
+    demands = {
+        view.course_key: _get_demand(server_config, view.course) for view in views
+    }
+    user_demands = dict()
+    for username in nbgrader.users:
+        user_demands[username] = demands[
+            nbgrader.get_user_course_views(username)[0].course_key
+        ]
+    total_cpu = sum(cpu for cpu, _ in user_demands.values()) or 1.0
+    total_mem = sum(mem for _, mem in user_demands.values()) or 1
+
+    def share(demand: Demand) -> float:
+        return max(demand[0] / total_cpu, demand[1] / total_mem)
+
+    if by == "user":
+        weights = {username: share(demand) for username, demand in user_demands.items()}
+    else:
+        weights = {
+            course_shard_key(view.course_key): len(view.members)
+            * share(demands[view.course_key])
+            for view in views
+        }
+
+    plan = ShardPlan(shard_count, by, weighted, load_factor, replicas)
+    plan.assignments = _assign(
+        HashRing(shard_count, replicas), weights, weighted, load_factor
+    )
+
+    for view in views:
+        if by == "course":
+            plan.shards[plan.assignments[course_shard_key(view.course_key)]][
+                "courses"
+            ] += 1
+        else:
+            for shard in {plan.assignments[username] for username in view.members}:
+                plan.shards[shard]["courses"] += 1
+    for username in nbgrader.users:
+        views = nbgrader.get_user_course_views(username)
+        if by == "user":
+            user_shards = {plan.assignments[username]: views[0].course_key}
+        else:
+            user_shards = dict()
+            for view in views:
+                user_shards.setdefault(
+                    plan.assignments[course_shard_key(view.course_key)], view.course_key
+                )
+        if len(user_shards) > 1:
+            plan.users_on_multiple_shards += 1
+        for shard, course_key in user_shards.items():
+            cpu, mem = demands[course_key]
+            plan.shards[shard]["users"] += 1
+            plan.shards[shard]["cpu_guarantee"] += cpu
+            plan.shards[shard]["mem_guarantee"] += mem
+    return plan
@@ -0,0 +1,95 @@
+import time
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from .schema import ServerConfig, StudentCourse
+from .schema.base import Image, Resources
+from .utils import deduplicate_mounts
+
+
+class SpawnProfile(BaseModel):
+    """
+    Everything needed to spawn the server of a user, resolved from a single config snapshot.
+
+    Attributes:
+        username (str): The username of the user.
+        courses (List[StudentCourse]): The courses the user is a member of.
+        image (Image): The image of the first course of the user, or the global image.
+        resources (Resources): The resources of the first course of the user, or the global
+            resources.
+        volume_mounts (List[Dict[str, Union[str, bool]]]): The deduplicated volume mounts of
+            all courses of the user.
+        commands (List[str]): The server commands followed by the commands of each course.
+        timings (Dict[str, float]): The duration of each resolution stage in seconds.
+    """
+
+    username: str = Field(..., description="Username of the user")
+    courses: List[StudentCourse] = Field(
+        list(), description="Courses the user is a member of"
+    )
+    image: Image = Field(..., description="Image settings")
+    resources: Resources = Field(..., description="Resource settings")
+    volume_mounts: List[Dict[str, Union[str, bool]]] = Field(
+        list(), description="Deduplicated volume mounts of all courses"
+    )
+    commands: List[str] = Field(
+        list(), description="Server commands followed by the course commands"
+    )
+    timings: Dict[str, float] = Field(
+        dict(), description="Duration of each resolution stage in seconds"
+    )
+
+
+def resolve_spawn_profile(
+    server_config: ServerConfig,
+    username: str,
+    courses: Optional[List[StudentCourse]] = None,
+) -> SpawnProfile:
+    """
+    Resolve the spawn profile of a user in a single pass over the config.
+
+    Args:
+        server_config (ServerConfig): The config snapshot to resolve the profile from.
+        username (str): The username of the user.
+        courses (Optional[List[StudentCourse]]): The active courses of the user, if they
+            were already looked up. Defaults to None, which looks them up.
+
+    Returns:
+        SpawnProfile: The resolved profile. If the user is not a member of any course, the
+        profile has no courses and no volume mounts.
+    """
+    timings = dict()
+    start = stage_start = time.perf_counter()
+
+    if courses is None:
+        courses = server_config.nbgrader.get_user_courses(username)
+    course = courses[0] if courses else None
+    now = time.perf_counter()
+    timings["courses"] = now - stage_start
+    stage_start = now
+
+    volume_mounts = []
+    for user_course in courses:
+        volume_mounts.extend(server_config.mounts.get_mounts(user_course, username))
+    volume_mounts = deduplicate_mounts(volume_mounts)
+    now = time.perf_counter()
+    timings["mounts"] = now - stage_start
+    stage_start = now
+
+    commands = list(server_config.all_commands)
+    for user_course in courses:
+        commands.extend(user_course.all_commands)
+    now = time.perf_counter()
+    timings["commands"] = now - stage_start
+    timings["total"] = now - start
+
+    return SpawnProfile.model_construct(
+        username=username,
+        courses=courses,
+        image=server_config.get_course_image(course),
+        resources=server_config.get_course_resources(course),
+        volume_mounts=volume_mounts,
+        commands=commands,
+        timings=timings,
+    )
@@ -0,0 +1,353 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .schema import ServerConfig
+from .schema.course import CourseView, StudentCourse
+
+# Directories modified less than this many seconds before they are read may change again
+# without a visible change of their modification time, so they are read again next time
+RACY_SECONDS = 2.0
+
+
+class DirectorySummary(NamedTuple):
+    """
+    The files below a directory entry.
+
+    Attributes:
+        files (int): The number of files.
+        size (int): The total size of the files in bytes.
+        last_modified (Optional[float]): The latest modification time of the files as a Unix
+            timestamp, None if there are no files.
+    """
+
+    files: int
+    size: int
+    last_modified: Optional[float]
+
+
+def merge_summaries(summaries: Iterable[DirectorySummary]) -> DirectorySummary:
+    files = 0
+    size = 0
+    last_modified = None
+    for summary in summaries:
+        files += summary.files
+        size += summary.size
+        if summary.last_modified is not None and (
+            last_modified is None or summary.last_modified > last_modified
+        ):
+            last_modified = summary.last_modified
+    return DirectorySummary(files, size, last_modified)
+
+
+class _CachedDirectory(NamedTuple):
+    mtime_ns: int
+    files: Dict[str, DirectorySummary]
+    subdirectories: Tuple[str, ...]
+
+
+class SubmissionStatus(NamedTuple):
+    """
+    The submissions of a course member.
+
+    Attributes:
+        username (str): The username of the course member.
+        submissions (int): The number of submissions in the inbound directory.
+        files (int): The number of submitted files.
+        size (int): The total size of the submitted files in bytes.
+        last_modified (Optional[float]): When a submitted file was last modified, as a Unix
+            timestamp.
+        feedback (Optional[int]): The number of feedback entries, None if the feedback is
+            not personalized or was not scanned.
+    """
+
+    username: str
+    submissions: int
+    files: int
+    size: int
+    last_modified: Optional[float]
+    feedback: Optional[int]
+
+    @property
+    def submitted(self) -> bool:
+        return self.submissions > 0
+
+
+class CourseSubmissionReport:
+    """
+    The submissions of all members of a course.
+
+    Attributes:
+        course (str): The course as course_name.semester_id.exam_period.
+        inbound (str): The local inbound directory of the course.
+        users (List[SubmissionStatus]): The status of each course member, sorted by username.
+        error (Optional[str]): Why the course could not be scanned.
+    """
+
+    def __init__(self, course: str, inbound: str):
+        self.course = course
+        self.inbound = inbound
+        self.users: List[SubmissionStatus] = []
+        self.error: Optional[str] = None
+
+    @property
+    def submitted(self) -> int:
+        return sum(1 for status in self.users if status.submitted)
+
+    @property
+    def missing(self) -> List[str]:
+        """
+        The course members without a submission.
+        """
+        return [status.username for status in self.users if not status.submitted]
+
+    @property
+    def size(self) -> int:
+        return sum(status.size for status in self.users)
+
+    @property
+    def last_modified(self) -> Optional[float]:
+        return merge_summaries(
+            DirectorySummary(status.files, status.size, status.last_modified)
+            for status in self.users
+        ).last_modified
+
+    def as_dict(self, include_users: bool = True) -> Dict[str, object]:
+        report = dict(
+            course=self.course,
+            inbound=self.inbound,
+            members=len(self.users),
+            submitted=self.submitted,
+            missing=self.missing,
+            size=self.size,
+            last_modified=self.last_modified,
+            error=self.error,
+        )
+        if include_users:
+            report["users"] = [
+                dict(status._asdict(), submitted=status.submitted)
+                for status in self.users
+            ]
+        return report
+
+
+class ScanStats:
+    """
+    How much of the exchange a scan had to read.
+
+    Attributes:
+        listed (int): Directories whose entries were read, because they are new or changed.
+        reused (int): Directories whose entries were taken from the cache.
+        duration (float): The duration of the scan in seconds.
+    """
+
+    def __init__(self):
+        self.listed = 0
+        self.reused = 0
+        self.duration = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(listed=self.listed, reused=self.reused, duration=self.duration)
+
+
+class SubmissionScanner:
+    """
+    Scans the exchange inbound and feedback directories of all course members.
+
+    The directories are resolved like the exchange mounts of the single-user servers, relative
+    to a local directory where the exchange volume is mounted. The entries of every directory
+    are cached with its modification time. A rescan only reads the entries of directories
+    whose modification time changed and otherwise only checks the modification times of the
+    subdirectories. Files that are changed in place without adding, removing or renaming an
+    entry of their directory are therefore not noticed until clear_cache is called.
+
+    Args:
+        server_config (ServerConfig): The config with the courses to scan.
+        volume_root (str): The local directory of the exchange volume.
+        max_workers (int): The number of threads scanning directories.
+        include_feedback (bool): Whether to count the personalized feedback too.
+    """
+
+    def __init__(
+        self,
+        server_config: ServerConfig,
+        volume_root: str,
+        max_workers: int = 8,
+        include_feedback: bool = True,
+    ):
+        self.server_config = server_config
+        self.volume_root = volume_root
+        self.max_workers = max_workers
+        self.include_feedback = include_feedback
+        self.stats = ScanStats()
+        self._cache: Dict[str, _CachedDirectory] = dict()
+        self._lock = threading.Lock()
+
+    def clear_cache(self) -> None:
+        """
+        Forget all directories, so the next scan reads everything again.
+        """
+        self._cache = dict()
+
+    def _count(self, listed: bool) -> None:
+        with self._lock:
+            if listed:
+                self.stats.listed += 1
+            else:
+                self.stats.reused += 1
+
+    def _evict(self, path: str, names: Iterable[str]) -> None:
+        """
+        Forget removed subdirectories of a directory and everything below them.
+        """
+        for name in names:
+            subdirectory = os.path.join(path, name)
+            prefix = subdirectory + os.sep
+            self._cache.pop(subdirectory, None)
+            for key in [key for key in list(self._cache) if key.startswith(prefix)]:
+                self._cache.pop(key, None)
+
+    def scan_directory(self, path: str) -> Optional[Dict[str, DirectorySummary]]:
+        """
+        Summarize the entries of a directory, using the cache for unchanged directories.
+
+        Args:
+            path (str): The path of the directory.
+
+        Returns:
+            Optional[Dict[str, DirectorySummary]]: The summary of each entry, None if the
+            directory does not exist.
+        """
+        try:
+            # The modification time is taken before the entries are read, so a change
+            # during the scan is noticed by the next scan
+            mtime_ns = os.stat(path).st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            self._cache.pop(path, None)
+            return None
+        cached = self._cache.get(path)
+        if cached is None or cached.mtime_ns != mtime_ns:
+            files = dict()
+            subdirectories = []
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append(entry.name)
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except FileNotFoundError:
+                            continue
+                        files[entry.name] = DirectorySummary(
+                            1, stat.st_size, stat.st_mtime
+                        )
+            if cached is not None:
+                self._evict(path, set(cached.subdirectories) - set(subdirectories))
+            cached = _CachedDirectory(mtime_ns, files, tuple(subdirectories))
+            if time.time() - mtime_ns / 1e9 < RACY_SECONDS:
+                cached = cached._replace(mtime_ns=-1)
+            self._cache[path] = cached
+            self._count(listed=True)
+        else:
+            self._count(listed=False)
+        summaries = dict(cached.files)
+        for name in cached.subdirectories:
+            entries = self.scan_directory(os.path.join(path, name))
+            if entries is not None:
+                summaries[name] = merge_summaries(entries.values())
+        return summaries
+
+    def _get_path(
+        self, course: StudentCourse, username: str, step: str, personalized: bool
+    ) -> str:
+        exchange = self.server_config.mounts.exchange
+        if not personalized:
+            # The sub-path of a shared directory does not depend on the user
+            username = ""
+        sub_path = course.exchange.get_subPath(exchange, course, username, step)
+        return os.path.normpath(os.path.join(self.volume_root, sub_path))
+
+    def _scan_user(
+        self,
+        course: StudentCourse,
+        username: str,
+        shared_inbound: Optional[Dict[str, DirectorySummary]],
+    ) -> SubmissionStatus:
+        exchange = course.exchange
+        if exchange.personalized_inbound:
+            entries = self.scan_directory(
+                self._get_path(course, username, "inbound", True)
+            )
+            submissions = list((entries or dict()).values())
+        else:
+            # nbgrader names shared submissions username+assignment+timestamp
+            prefix = f"{username}+"
+            submissions = [
+                summary
+                for name, summary in (shared_inbound or dict()).items()
+                if name.startswith(prefix)
+            ]
+        feedback = None
+        if self.include_feedback and exchange.personalized_feedback:
+            feedback = len(
+                self.scan_directory(self._get_path(course, username, "feedback", True))
+                or ()
+            )
+        summary = merge_summaries(submissions)
+        return SubmissionStatus(
+            username=username,
+            submissions=len(submissions),
+            files=summary.files,
+            size=summary.size,
+            last_modified=summary.last_modified,
+            feedback=feedback,
+        )
+
+    def _scan_course(
+        self, executor: ThreadPoolExecutor, view: CourseView
+    ) -> CourseSubmissionReport:
+        course = view.course
+        personalized = course.exchange.personalized_inbound
+        report = CourseSubmissionReport(
+            ".".join(view.course_key), self._get_path(course, "", "inbound", False)
+        )
+        try:
+            shared_inbound = (
+                None if personalized else self.scan_directory(report.inbound)
+            )
+            report.users = list(
+                executor.map(
+                    lambda username: self._scan_user(course, username, shared_inbound),
+                    sorted(view.members),
+                )
+            )
+        except OSError as error:
+            report.error = f"{type(error).__name__}: {error}"
+        return report
+
+    def scan(
+        self, course_keys: Optional[Iterable[Tuple[str, str, str]]] = None
+    ) -> List[CourseSubmissionReport]:
+        """
+        Scan the submissions of all course members.
+
+        Args:
+            course_keys (Optional[Iterable[Tuple[str, str, str]]]): The courses to scan.
+                Defaults to None, which scans all configured courses.
+
+        Returns:
+            List[CourseSubmissionReport]: The report of each course in the configured order.
+        """
+        selected = set(course_keys) if course_keys is not None else None
+        self.stats = ScanStats()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(self.max_workers, 1)) as executor:
+            reports = [
+                self._scan_course(executor, view)
+                for view in self.server_config.nbgrader.course_views
+                if selected is None or view.course_key in selected
+            ]
+        self.stats.duration = time.perf_counter() - start
+        return reports